@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ML_DIR = os.path.dirname(BENCH_DIR)
+REPO_DIR = os.path.dirname(ML_DIR)
+sys.path.insert(0, ML_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from src.blocking import merge_candidate_pairs, candidate_frame  # noqa: E402
+from src.features import build_features, pair_features  # noqa: E402
+from src.ml_predict import score_candidates  # noqa: E402
+from src.similarity_cache import clear_caches  # noqa: E402
+from src.synthetic import generate_identities, true_pairs  # noqa: E402
+import project1developers  # noqa: E402
+
+BASELINE_JSON = os.path.join(BENCH_DIR, "baseline.json")
+STAGES = ["merge_candidates", "build_features", "pair_features", "score_candidates", "bird"]
+
+# Counts are deterministic for a seed and must match the baseline exactly
+COUNT_KEYS = ("items", "candidates", "true_pairs", "found_pairs", "rows")
+
+
+def measure(fn, memory=True, repeat=1, setup=None):
+    """
+    Run fn() `repeat` times and return (result, stats) with the best wall
+    and CPU seconds and, with `memory`, the peak traced allocation in MB.
+    `setup` is called before every run (e.g. to clear caches). Allocation
+    tracing slows pure-Python stages, so only compare runs made with the
+    same setting.
+    """
+    best = None
+    for _ in range(max(int(repeat), 1)):
+        if setup is not None:
+            setup()
+        if memory:
+            tracemalloc.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = fn()
+        stats = {
+            "wall_s": round(time.perf_counter() - wall, 4),
+            "cpu_s": round(time.process_time() - cpu, 4),
+        }
+        if memory:
+            stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            tracemalloc.stop()
+        if best is None:
+            best = stats
+        else:
+            best["wall_s"] = min(best["wall_s"], stats["wall_s"])
+            best["cpu_s"] = min(best["cpu_s"], stats["cpu_s"])
+    best["repeat"] = max(int(repeat), 1)
+    return result, best
+
+
+def _throughput(stats, items):
+    stats["items"] = int(items)
+    stats["items_per_s"] = round(items / max(stats["wall_s"], 1e-9), 1)
+    return stats
+
+
+def _train_model(X, y):
+    # a model fitted on the synthetic ground truth, only its scoring cost matters
+    if len(np.unique(y)) < 2:
+        y = np.arange(len(y)) % 2
+    return LogisticRegression(max_iter=500, class_weight="balanced").fit(X, y)
+
+
+def run_size(n, seed=0, stages=STAGES, memory=True, max_scalar_pairs=20_000,
+             max_feature_pairs=1_000_000, max_bird_pairs=2_000_000, threshold=0.65, repeat=3,
+             chunksize=100_000):
+    """
+    Benchmark every requested stage on n synthetic identities; each stage
+    is timed `repeat` times and the best time kept. pair_features and
+    score_candidates run on the first `max_feature_pairs` candidates, and
+    scoring streams `chunksize` rows at a time, so large sizes fit in memory.
+    """
+    identities = generate_identities(n, seed=seed)
+    records = identities[["name", "email"]].to_dict("records")
+    person = identities["person_id"].to_numpy()
+    results = {}
+
+    (table, left, right), stats = measure(lambda: merge_candidate_pairs(records), memory,
+                                          repeat, clear_caches)
+    # blocking recall against the generator's ground truth
+    truth = true_pairs(identities)
+    lo, hi = np.minimum(left, right), np.maximum(left, right)
+    tpos = {(int(i), int(j)) for i, j in truth}
+    # identity ids are first-seen positions, so they equal row positions here
+    found = sum((int(i), int(j)) in tpos for i, j in zip(lo, hi)) if len(table) == n else None
+    stats = _throughput(stats, n)
+    stats.update(candidates=int(len(left)), true_pairs=len(truth), found_pairs=found)
+    if found is not None:
+        stats["pair_completeness"] = round(found / max(len(truth), 1), 4)
+    if "merge_candidates" in stages:
+        results["merge_candidates"] = stats
+
+    if "build_features" in stages:
+        # the scalar per-pair path, on a capped prefix of the candidates
+        k = min(len(left), max_scalar_pairs)
+        pairs = [((table["name"][a], table["email"][a]), (table["name"][b], table["email"][b]))
+                 for a, b in zip(left[:k].tolist(), right[:k].tolist())]
+        _, stats = measure(lambda: [build_features(p, q) for p, q in pairs], memory,
+                           repeat, clear_caches)
+        results["build_features"] = _throughput(stats, k)
+
+    X = None
+    k = min(len(left), max_feature_pairs)
+    fleft, fright = left[:k], right[:k]
+    if "pair_features" in stages or "score_candidates" in stages:
+        X, stats = measure(lambda: pair_features(table, fleft, fright), memory,
+                           repeat, clear_caches)
+        if "pair_features" in stages:
+            results["pair_features"] = _throughput(stats, k)
+
+    if "score_candidates" in stages:
+        y = (person[fleft] == person[fright]).astype(int)
+        with tempfile.TemporaryDirectory() as tmp:
+            candidates_csv = os.path.join(tmp, "candidates.csv")
+            model_pkl = os.path.join(tmp, "model.pkl")
+            out_csv = os.path.join(tmp, "scored.csv")
+            candidate_frame(table, fleft, fright).to_csv(candidates_csv, index=False)
+            joblib.dump(_train_model(X, y), model_pkl)
+            _, stats = measure(
+                lambda: score_candidates(candidates_csv, model_pkl, out_csv, chunksize=chunksize),
+                memory, repeat, clear_caches)
+        results["score_candidates"] = _throughput(stats, k)
+
+    if "bird" in stages:
+        devs = list(zip(identities["name"], identities["email"]))
+        k = min(len(left), max_bird_pairs)
+        pairs = list(zip(lo[:k].tolist(), hi[:k].tolist()))
+        rows, stats = measure(
+            lambda: sum(1 for _ in project1developers.similarity_rows(devs, pairs, threshold)),
+            memory, repeat, clear_caches)
+        stats = _throughput(stats, k)
+        stats["rows"] = rows
+        results["bird"] = stats
+
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def compare(report, baseline, tolerance=0.3, min_wall_s=1.0):
+    """
+    Compare `report` against `baseline`. Returns (problems, warnings):
+    changed counts are problems, as they are deterministic for a seed;
+    throughput below (1 - tolerance) of the baseline and peak memory above
+    (1 + tolerance) of it are warnings, since timings vary between runs.
+    Throughput is not compared for stages that took less than `min_wall_s`
+    in the baseline, which are dominated by noise. Sizes or stages missing
+    from either side are skipped.
+    """
+    problems, warnings = [], []
+    for size, stages in report["results"].items():
+        for stage, stats in stages.items():
+            base = baseline.get("results", {}).get(size, {}).get(stage)
+            if base is None:
+                continue
+            where = f"{stage} @ {size}"
+            for key in COUNT_KEYS:
+                if key in base and stats.get(key) != base[key]:
+                    problems.append(f"{where}: {key} {base[key]} -> {stats.get(key)}")
+            if base["wall_s"] >= min_wall_s and \
+                    stats["items_per_s"] < base["items_per_s"] * (1 - tolerance):
+                warnings.append(f"{where}: throughput {base['items_per_s']} -> "
+                                f"{stats['items_per_s']} items/s")
+            if "peak_mb" in base and "peak_mb" in stats and \
+                    stats["peak_mb"] > base["peak_mb"] * (1 + tolerance) + 1:
+                warnings.append(f"{where}: peak memory {base['peak_mb']} -> {stats['peak_mb']} MB")
+    return problems, warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the identity pipeline on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000],
+                        help="Numbers of synthetic identities (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc (faster, but no peak memory)")
+    parser.add_argument("--max-scalar-pairs", type=int, default=20_000,
+                        help="Pairs timed with the scalar build_features")
+    parser.add_argument("--max-feature-pairs", type=int, default=1_000_000,
+                        help="Pairs timed with pair_features and score_candidates")
+    parser.add_argument("--chunksize", type=int, default=100_000,
+                        help="Rows per chunk when scoring candidates")
+    parser.add_argument("--max-bird-pairs", type=int, default=2_000_000,
+                        help="Pairs fed to the Bird loop")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--baseline", default=BASELINE_JSON,
+                        help="Baseline JSON to compare against")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per stage; the best time is reported")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--min-wall", type=float, default=1.0,
+                        help="Baseline seconds below which throughput is not compared")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write the report to --baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    report = {"seed": args.seed, "memory": not args.no_memory, "environment": environment(),
+              "results": {}}
+    for n in args.sizes:
+        print(f"{n} identities")
+        report["results"][str(n)] = run_size(
+            n, seed=args.seed, stages=args.stages, memory=not args.no_memory,
+            max_scalar_pairs=args.max_scalar_pairs, max_feature_pairs=args.max_feature_pairs,
+            max_bird_pairs=args.max_bird_pairs, repeat=args.repeat, chunksize=args.chunksize)
+        for stage, stats in report["results"][str(n)].items():
+            extra = f"  candidates={stats['candidates']}" if "candidates" in stats else ""
+            peak = f"  peak={stats['peak_mb']}MB" if "peak_mb" in stats else ""
+            print(f"  {stage:<17} {stats['items_per_s']:>12.1f} items/s  "
+                  f"wall={stats['wall_s']}s{peak}{extra}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ERROR: no baseline at {args.baseline}; nothing was compared. "
+              f"Record one with --update-baseline.", file=sys.stderr)
+        return 2
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    for size in report["results"]:
+        if size not in baseline.get("results", {}):
+            print(f"WARNING: the baseline has no results for {size} identities; not compared",
+                  file=sys.stderr)
+    if baseline.get("memory") != report["memory"]:
+        print("baseline was recorded with a different memory setting; throughput is not comparable")
+    problems, warnings = compare(report, baseline, args.tolerance, args.min_wall)
+    for w in warnings:
+        print("WARNING", w, file=sys.stderr)
+    for p in problems:
+        print("REGRESSION", p)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,32 +2,126 @@ import src.convert_labels as convert_labels
 import src.ml_build_dataset as ml_build_dataset
 import src.ml_train as ml_train
 import src.ml_predict as ml_predict
+import src.clustering as clustering
+import src.dedup_index as dedup_index
+from src.instrumentation import PipelineProfiler
+from src.pipeline import Stage, run_stages
+from src.features import FEATURE_NAMES, FEATURE_VERSION
+import argparse
 
 def main():
-    
-    print("Converting labels")
-    convert_labels.parse_excel(
-        input_xlsx="devs_similarity_t=0.65.xlsx",
-        output_labels_csv="labels_from_excel.csv",
-        output_candidates_csv="candidates_from_excel.csv"
-        )
-
-
-    print("Building training dataset")
-    ml_build_dataset.build_dataset(candidates_csv="candidates_from_excel.csv",
-                                   labels_csv="labels_from_excel.csv",
-                                   out_csv="train_dataset.csv"
-                                   )
-
-    print("Training logistic regression model")
-    ml_train.train_and_eval(train_csv="train_dataset.csv",model_out="logreg.pkl")
-
-    print("Scoring candidate pairs with trained model")
-    ml_predict.score_candidates(candidates_csv="devs_similarity.csv",
-                                model_pkl="logreg.pkl",
-                                out_csv="3ml_scored_p0915.csv",
-                                threshold=0.915
-                                )
+    parser = argparse.ArgumentParser(description="Developer identity ML pipeline")
+    parser.add_argument("--incremental", metavar="NEW_DEVS_CSV",
+                        help="Only score the identities of this name,email CSV against the "
+                             "persisted index and update its clusters")
+    parser.add_argument("--threshold", type=float, default=0.915,
+                        help="Probability cut for the scored pairs and the clusters")
+    parser.add_argument("--force", action="store_true",
+                        help="Run every stage even if its inputs and parameters are unchanged")
+    parser.add_argument("--report", default="pipeline_report.json",
+                        help="Write per-stage wall/CPU time, memory, per-feature time and, "
+                             "for stages that block (--incremental), pair counts per blocking "
+                             "pass here as JSON")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also trace peak Python allocations per stage (slower)")
+    parser.add_argument("--profile", metavar="PSTATS",
+                        help="Profile the whole run with cProfile and dump the stats here")
+    args = parser.parse_args()
+
+    profiler = PipelineProfiler(trace_memory=args.trace_memory, profile_out=args.profile)
+    try:
+        with profiler:
+            run(args, profiler)
+    finally:
+        # also written when a stage fails, with the stages that finished
+        profiler.write(args.report)
+        for stage in profiler.stages:
+            print(f"{stage['stage']:<16} wall={stage['wall_s']}s cpu={stage['cpu_s']}s "
+                  f"max_rss={stage['max_rss_mb']}MB" + (" (skipped)" if stage.get("skipped") else ""))
+        print("Report:", args.report)
+
+
+def run(args, profiler):
+    if args.incremental:
+        print("Updating the identity index with new developers")
+        with profiler.stage("update_index"):
+            dedup_index.update_index(index_pkl="dedup_index.pkl",
+                                     new_devs_csv=args.incremental,
+                                     model_pkl="logreg.pkl",
+                                     out_csv="3ml_clusters.csv",
+                                     scored_csv="3ml_scored_incremental.csv",
+                                     threshold=args.threshold,
+                                     seed_clusters_csv="3ml_clusters.csv",
+                                     seed_devs_csv="devs_similarity.csv"
+                                     )
+        return
+
+    threshold = args.threshold
+    scored_csv = f"3ml_scored_p{threshold:g}".replace(".", "") + ".csv"
+    features = {"feature_version": FEATURE_VERSION, "features": FEATURE_NAMES}
+
+    def convert():
+        print("Converting labels")
+        convert_labels.parse_excel(
+            input_xlsx="devs_similarity_t=0.65.xlsx",
+            output_labels_csv="labels_from_excel.csv",
+            output_candidates_csv="candidates_from_excel.csv"
+            )
+
+    def build():
+        print("Building training dataset")
+        ml_build_dataset.build_dataset(candidates_csv="candidates_from_excel.csv",
+                                       labels_csv="labels_from_excel.csv",
+                                       out_csv="train_dataset.csv",
+                                       feature_cache="feature_cache"
+                                       )
+
+    def train():
+        print("Training logistic regression model")
+        ml_train.train_and_eval(train_csv="train_dataset.csv",model_out="logreg.pkl")
+
+    def score():
+        print("Scoring candidate pairs with trained model")
+        ml_predict.score_candidates(candidates_csv="devs_similarity.csv",
+                                    model_pkl="logreg.pkl",
+                                    out_csv="3ml_scored_all.csv",
+                                    chunksize=100_000,
+                                    feature_cache="feature_cache"
+                                    )
+
+    def cut():
+        print(f"Keeping pairs with proba >= {threshold}")
+        ml_predict.cut_scored(scored_csv="3ml_scored_all.csv",
+                              out_csv=scored_csv,
+                              threshold=threshold
+                              )
+
+    def cluster():
+        print("Clustering scored pairs into developer identities")
+        clustering.cluster_scored_csv(scored_csv=scored_csv,
+                                      out_csv="3ml_clusters.csv",
+                                      stats_csv="3ml_cluster_stats.csv",
+                                      threshold=threshold
+                                      )
+
+    # Every stage is skipped when its inputs and parameters hash the same as
+    # last time, so changing only --threshold re-runs just cut and cluster
+    stages = [
+        Stage("convert_labels", convert, inputs=["devs_similarity_t=0.65.xlsx"],
+              outputs=["labels_from_excel.csv", "candidates_from_excel.csv"]),
+        Stage("build_dataset", build, inputs=["candidates_from_excel.csv", "labels_from_excel.csv"],
+              outputs=["train_dataset.csv"], params=features),
+        Stage("train", train, inputs=["train_dataset.csv"], outputs=["logreg.pkl"],
+              params={"test_size": 0.25, "random_state": 42}),
+        Stage("score", score, inputs=["devs_similarity.csv", "logreg.pkl"],
+              outputs=["3ml_scored_all.csv"], params=features),
+        Stage("cut", cut, inputs=["3ml_scored_all.csv"], outputs=[scored_csv],
+              params={"threshold": threshold}),
+        Stage("cluster", cluster, inputs=[scored_csv],
+              outputs=["3ml_clusters.csv", "3ml_cluster_stats.csv"],
+              params={"threshold": threshold}),
+    ]
+    run_stages(stages, "pipeline_state.json", force=args.force, profiler=profiler)
 
 if __name__ == "__main__":
     main()
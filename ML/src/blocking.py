@@ -1,5 +1,14 @@
+import math
+import re
+import zlib
 from collections import defaultdict
-from src.preprocess import split_name, normalize_email, normalize_name
+from itertools import chain
+import numpy as np
+import pandas as pd
+from src import instrumentation
+from src.preprocess import split_name, normalize_email, normalize_name, parse_gh_handle
+from src.identities import build_identity_table, identity_ids
+from src.similarity_cache import phonetic_codes
 
 COMMON_DOMAINS = {
     "gmail.com", "googlemail.com", "yahoo.com", "outlook.com", "hotmail.com",
@@ -7,26 +16,33 @@ COMMON_DOMAINS = {
     "gmx.com", "gmx.de", "yandex.ru", "yandex.com"
 }
 
-def parse_gh_handle(local, domain):
-    if domain == "users.noreply.github.com" and "+" in local:
-        return local.split("+", 1)[1]
-    return ""
+# Bucket keys of the merge_candidates passes, in order
+KEY_PASSES = (
+    ("domain", "lastname_initial"),
+    ("gh_handle",),
+    ("domain", "prefix_initial"),
+    ("lastname_initial",),
+)
 
-def bucket_key(record, key=("domain", "lastname_initial"), ignore_common_domains=True):
-    """
-    Generate a bucket key for grouping records based on specified fields.
+# Optional phonetic pass: same metaphone of the last name and same first
+# initial, so spellings of a surname with different initial letters
+# ("Knight"/"Night", "Cohen"/"Kohen") still meet
+PHONETIC_PASS = ("metaphone_last", "first_initial")
 
-    The `key` argument defines which components to include. Supported values:
-      - "domain"           Use the email domain.
-      - "lastname_initial" Use the first letter of the last name.
-      - "prefix_initial"   Use the first letter of the email prefix (or GitHub handle if applicable).
-      - "gh_handle"        Use the GitHub username extracted from a noreply address.
+# Finer components used, in this order, to split buckets above max_bucket
+REFINEMENTS = (
+    "last_prefix2",
+    "first_initial",
+    "second_initial",
+    "soundex_last",
+    "prefix3",
+    "last_prefix4",
+    "first_prefix4",
+    "prefix5",
+)
 
-    Common email domains can be ignored by setting `ignore_common_domains=True`.
-    """
-    _, local, domain = normalize_email(record["email"])
-    _, last = split_name(normalize_name(record["name"]))
 
+def _key_components(name, last, local, domain, ignore_common_domains):
     if ignore_common_domains and domain in COMMON_DOMAINS:
         domain_part = ""
     else:
@@ -37,7 +53,7 @@ def bucket_key(record, key=("domain", "lastname_initial"), ignore_common_domains
     else:
         lastname_initial = ""
 
-    gh_user = parse_gh_handle(local, domain) 
+    gh_user = parse_gh_handle(local, domain)
     if gh_user:
         base = gh_user
     else:
@@ -48,50 +64,544 @@ def bucket_key(record, key=("domain", "lastname_initial"), ignore_common_domains
     else:
         prefix_initial = ""
 
-    gh_handle = gh_user  
+    gh_handle = gh_user
+
+    soundex_last, metaphone_last = phonetic_codes(last) if last else ("", "")
+
+    tokens = name.split()
+    first = tokens[0] if tokens else ""
+    second = tokens[1] if len(tokens) > 1 else ""
 
-    components = {
+    return {
         "domain": domain_part,
         "lastname_initial": lastname_initial,
         "prefix_initial": prefix_initial,
         "gh_handle": gh_handle,
+        "last_prefix2": last[:2],
+        "last_prefix4": last[:4],
+        "first_initial": first[:1],
+        "first_prefix4": first[:4],
+        "second_initial": second[:1],
+        "soundex_last": soundex_last,
+        "metaphone_last": metaphone_last,
+        "prefix3": base[:3],
+        "prefix5": base[:5],
     }
 
+
+def _join_key(components, key):
     parts = []
     for k in key:
         parts.append(components.get(k, ""))
-
     return "|".join(parts)
 
-def make_candidates(records, key=("domain", "lastname_initial"),
-                    max_bucket=1000, ignore_common_domains=True):
+
+def _pass_key(components, key):
+    # bucket key of a blocking pass; None when every component is empty, so
+    # identities without e.g. a GitHub handle do not share one "" bucket
+    if not any(components.get(k, "") for k in key):
+        return None
+    return _join_key(components, key)
+
+
+def bucket_key(record, key=("domain", "lastname_initial"), ignore_common_domains=True):
+    """
+    Generate a bucket key for grouping records based on specified fields.
+
+    The `key` argument defines which components to include. Supported values:
+      - "domain"           Use the email domain.
+      - "lastname_initial" Use the first letter of the last name.
+      - "prefix_initial"   Use the first letter of the email prefix (or GitHub handle if applicable).
+      - "gh_handle"        Use the GitHub username extracted from a noreply address.
+
+    Common email domains can be ignored by setting `ignore_common_domains=True`.
+    """
+    _, local, domain = normalize_email(record["email"])
+    name = normalize_name(record["name"])
+    _, last = split_name(name)
+    return _join_key(_key_components(name, last, local, domain, ignore_common_domains), key)
+
+
+def record_table(records):
+    """Identity table of the records and the identity id of every record."""
+    names = [r["name"] for r in records]
+    emails = [r["email"] for r in records]
+    table = build_identity_table(names, emails)
+    return table, identity_ids(table, names, emails)
+
+
+def record_components(records, ignore_common_domains=True, table=None, ids=None):
+    """
+    Bucket-key components for every record, computed once per unique
+    (name, email) via the identity table rather than once per record and pass.
+    """
+    if table is None:
+        table, ids = record_table(list(records))
+    per_identity = [
+        _key_components(name, last, local, domain, ignore_common_domains)
+        for name, last, local, domain in zip(
+            table["norm_name"], table["norm_last"], table["local"], table["domain"]
+        )
+    ]
+    return [per_identity[i] for i in ids]
+
+
+def identity_components(row, ignore_common_domains=True):
+    """Bucket-key components of one identity record (identities.identity_record)."""
+    return _key_components(row["norm_name"], row["norm_last"], row["local"], row["domain"],
+                           ignore_common_domains)
+
+
+def _new_pass_report():
+    return {"pairs": 0, "split_buckets": 0, "dropped_buckets": 0, "dropped_pairs": 0}
+
+
+def _all_pairs(items):
+    n = len(items)
+    for i in range(n):
+        for j in range(i + 1, n):
+            yield items[i], items[j]
+
+
+def _split_bucket(items, components, max_bucket, level, stats):
+    # split an oversized bucket by the next refinement until the parts fit
+    if len(items) < 2:
+        return
+    if len(items) <= max_bucket:
+        yield from _all_pairs(items)
+        return
+    if components is None or level >= len(REFINEMENTS):
+        stats["dropped_buckets"] += 1
+        stats["dropped_pairs"] += len(items) * (len(items) - 1) // 2
+        return
+    stats["split_buckets"] += 1
+    parts = defaultdict(list)
+    for i in items:
+        parts[components[i][REFINEMENTS[level]]].append(i)
+    for part in parts.values():
+        yield from _split_bucket(part, components, max_bucket, level + 1, stats)
+
+
+def _bucket_index_pairs(keys, max_bucket, components=None, stats=None):
+    if stats is None:
+        stats = _new_pass_report()
     buckets = defaultdict(list)
-    for r in records:
-        k = bucket_key(r, key=key, ignore_common_domains=ignore_common_domains)
-        buckets[k].append(r)
+    for i, k in enumerate(keys):
+        if k is not None:
+            buckets[k].append(i)
 
     for items in buckets.values():
+        for pair in _split_bucket(items, components, max_bucket, 0, stats):
+            stats["pairs"] += 1
+            yield pair
+
+
+def _group_index_pairs(groups, max_bucket, stats=None):
+    # pairs of positions sharing a group label; -1 means "no group"
+    if stats is None:
+        stats = _new_pass_report()
+    groups = np.asarray(groups)
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    bounds = np.flatnonzero(np.diff(sorted_groups)) + 1
+    for items in np.split(order, bounds):
         n = len(items)
-        if n < 2 or n > max_bucket:
+        if n < 2 or groups[items[0]] < 0:
             continue
-        for i in range(n):
-            for j in range(i + 1, n):
-                yield items[i], items[j]
+        if n > max_bucket:
+            stats["dropped_buckets"] += 1
+            stats["dropped_pairs"] += n * (n - 1) // 2
+            continue
+        for pair in _all_pairs(items.tolist()):
+            stats["pairs"] += 1
+            yield pair
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_ALNUM = re.compile(r"[^0-9a-z]")
+
+
+def _identity_shingles(table, ngram):
+    # character n-grams of the normalized name and of the email local part
+    # (GitHub handle for noreply addresses), with separators removed so that
+    # "john smith", "smith john" and "john.smith" share most of their n-grams
+    shingles = []
+    for name, local, gh in zip(table["norm_name"], table["local"], table["gh_handle"]):
+        grams = set()
+        for text in (name, gh or local):
+            text = _ALNUM.sub("", text)
+            if 0 < len(text) < ngram:
+                grams.add(text)
+            for k in range(len(text) - ngram + 1):
+                grams.add(text[k:k + ngram])
+        shingles.append(grams)
+    return shingles
+
 
-def merge_candidates(records, max_bucket=1000, ignore_common_domains=True):
+def minhash_signatures(table, num_perm=64, ngram=3, seed=0):
+    """
+    MinHash signatures of every identity's name/email n-grams.
+
+    Returns a (n_identities, num_perm) uint64 array and a boolean mask of the
+    identities that have at least one n-gram (rows without are meaningless).
+    """
+    shingles = _identity_shingles(table, ngram)
+    sizes = np.array([len(g) for g in shingles], dtype=np.int64)
+    hashes = np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) for grams in shingles for g in sorted(grams)),
+        dtype=np.uint64, count=int(sizes.sum()),
+    )
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    sig = np.full((len(shingles), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    has = sizes > 0
+    if hashes.size:
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[has]
+        for k in range(num_perm):
+            # a, b, h < 2**32 so a * h + b stays below 2**64
+            values = (a[k] * hashes + b[k]) % _MERSENNE_PRIME
+            sig[has, k] = np.minimum.reduceat(values, starts)
+    return sig, has
+
+
+def _minhash_index_pairs(table, ids, bands, rows, ngram, seed, max_bucket, stats=None):
+    sig, has = minhash_signatures(table, num_perm=bands * rows, ngram=ngram, seed=seed)
+    record_sig = sig[ids]
+    usable = has[ids]
     seen = set()
-    passes = [
-        ("domain", "lastname_initial"),
-        ("gh_handle",),
-        ("domain", "prefix_initial"),
-        ("lastname_initial",),
-    ]
-    for key in passes:
-        for a, b in make_candidates(records, key=key,
-                                    max_bucket=max_bucket,
-                                    ignore_common_domains=ignore_common_domains):
-            ea, eb = a["email"].lower(), b["email"].lower()
-            pair = tuple(sorted([ea, eb]))
+    for band in range(bands):
+        cols = record_sig[:, band * rows:(band + 1) * rows]
+        _, groups = np.unique(cols, axis=0, return_inverse=True)
+        groups = np.where(usable, groups.ravel(), -1)
+        for pair in _group_index_pairs(groups, max_bucket, stats):
             if pair not in seen:
                 seen.add(pair)
-                yield a, b
+                yield pair
+
+
+def minhash_candidates(records, bands=16, rows=4, ngram=3, seed=0, max_bucket=1000):
+    """
+    Locality-sensitive blocking: records whose MinHash signatures agree on
+    all `rows` values of at least one of `bands` bands become candidates.
+
+    Signatures cover character n-grams of the normalized name and the email
+    local part, so typos and reordered names still collide. Pairs with n-gram
+    Jaccard similarity s are found with probability 1 - (1 - s**rows)**bands
+    (about 0.5 at s = (1 / bands) ** (1 / rows)); more bands raise recall,
+    more rows cut false candidates. Bands whose bucket exceeds `max_bucket`
+    are skipped.
+    """
+    records = list(records)
+    table, ids = record_table(records)
+    for i, j in _minhash_index_pairs(table, ids, bands, rows, ngram, seed, max_bucket):
+        yield records[i], records[j]
+
+
+def _prefix_length(size, threshold):
+    # a set of `size` tokens can only reach Jaccard >= threshold with another
+    # set if the two share a token among their first size - ceil(t * size) + 1
+    # tokens under a common global order (the epsilon errs on the long side)
+    return size - math.ceil(threshold * size - 1e-9) + 1
+
+
+def qgram_identity_pairs(shingles, threshold=0.5, stats=None):
+    """
+    All pairs of sets in `shingles` with Jaccard similarity >= `threshold`.
+
+    AllPairs/PPJoin-style similarity join: tokens are ranked rarest first,
+    sets are visited by increasing size, and only the prefix tokens of each
+    set go into the inverted index. A probe only meets sets it shares a
+    prefix token with and that pass the length filter (|y| >= t * |x|); each
+    such candidate is verified on the exact overlap, so no pair above the
+    threshold is missed. Returns (i, j) index pairs with i < j.
+    """
+    if stats is None:
+        stats = _new_pass_report()
+    stats.setdefault("candidates", 0)
+
+    df = defaultdict(int)
+    for grams in shingles:
+        for g in grams:
+            df[g] += 1
+    rank = {g: r for r, g in enumerate(sorted(df, key=lambda g: (df[g], g)))}
+
+    tokens = [sorted(rank[g] for g in grams) for grams in shingles]
+    sets = [set(t) for t in tokens]
+    order = sorted((k for k in range(len(tokens)) if tokens[k]), key=lambda k: (len(tokens[k]), k))
+
+    index = defaultdict(list)
+    pairs = []
+    for x in order:
+        size = len(tokens[x])
+        min_size = threshold * size - 1e-9
+        prefix = tokens[x][:_prefix_length(size, threshold)]
+        seen = set()
+        for token in prefix:
+            for y in index[token]:
+                if y in seen or len(tokens[y]) < min_size:
+                    continue
+                seen.add(y)
+                stats["candidates"] += 1
+                overlap = len(sets[x] & sets[y])
+                if overlap >= threshold * (size + len(tokens[y]) - overlap):
+                    pairs.append((y, x) if y < x else (x, y))
+        for token in prefix:
+            index[token].append(x)
+    return pairs
+
+
+def _qgram_index_pairs(table, ids, threshold, ngram, stats=None):
+    if stats is None:
+        stats = _new_pass_report()
+    shingles = _identity_shingles(table, ngram)
+    positions = defaultdict(list)
+    for pos, ident in enumerate(ids.tolist()):
+        positions[ident].append(pos)
+
+    # records repeating one (name, email) trivially match each other
+    for ident, items in positions.items():
+        if shingles[ident]:
+            for pair in _all_pairs(items):
+                stats["pairs"] += 1
+                yield pair
+    for a, b in qgram_identity_pairs(shingles, threshold, stats):
+        for i in positions.get(a, ()):
+            for j in positions.get(b, ()):
+                stats["pairs"] += 1
+                yield (i, j) if i < j else (j, i)
+
+
+def qgram_candidates(records, threshold=0.5, ngram=3):
+    """
+    Similarity-join blocking: records whose name/email n-gram sets (the same
+    shingles as minhash_candidates) have Jaccard similarity >= `threshold`.
+
+    Unlike the LSH pass this is exact: every pair at or above the threshold
+    is produced and nothing below it, using an inverted index with prefix,
+    length and count filtering instead of comparing all pairs.
+    """
+    records = list(records)
+    table, ids = record_table(records)
+    for i, j in _qgram_index_pairs(table, ids, threshold, ngram):
+        yield records[i], records[j]
+
+
+def _sort_key_values(table, key):
+    if key == "name":
+        return list(table["norm_name"])
+    if key == "reversed_name":
+        return [n[::-1] for n in table["norm_name"]]
+    if key == "last_first":
+        return [" ".join(reversed(n.split())) for n in table["norm_name"]]
+    if key == "local":
+        return list(table["local"])
+    if key == "gh_handle":
+        return list(table["gh_handle"])
+    raise ValueError(f"Unknown sort key: {key}")
+
+
+def _neighbourhood_index_pairs(table, ids, keys, window, stats=None):
+    if stats is None:
+        stats = _new_pass_report()
+    seen = set()
+    for key in keys:
+        values = np.array(_sort_key_values(table, key), dtype=object)[ids]
+        positions = np.flatnonzero(values != "")
+        order = positions[np.argsort(values[positions], kind="stable")]
+        for offset in range(1, window):
+            for i, j in zip(order[:-offset].tolist(), order[offset:].tolist()):
+                pair = (i, j) if i < j else (j, i)
+                if pair not in seen:
+                    seen.add(pair)
+                    stats["pairs"] += 1
+                    yield pair
+
+
+def sorted_neighbourhood_candidates(records, keys=("name", "reversed_name", "local", "gh_handle"),
+                                    window=5):
+    """
+    Sorted-neighbourhood blocking: for every sort key the records are sorted
+    by that key and each one is paired with the next `window - 1` records.
+
+    Supported keys: "name" (normalized name), "reversed_name" (the same string
+    reversed, so typos near the start still sort close), "last_first" (name
+    tokens in reverse order), "local" (email local part) and "gh_handle".
+    Records with an empty key are left out of that key's pass. Produces at
+    most len(keys) * (window - 1) * n pairs.
+    """
+    records = list(records)
+    table, ids = record_table(records)
+    for i, j in _neighbourhood_index_pairs(table, ids, keys, window):
+        yield records[i], records[j]
+
+
+def make_candidates(records, key=("domain", "lastname_initial"),
+                    max_bucket=1000, ignore_common_domains=True, components=None,
+                    split_oversized=True, report=None):
+    """
+    Pairs of records sharing the bucket key. Records whose key components
+    are all empty (e.g. no GitHub handle for the gh_handle pass) are left out.
+
+    Buckets above `max_bucket` are split recursively by the finer components
+    in REFINEMENTS until every part fits; parts that still do not fit after
+    the last refinement are dropped (all buckets above `max_bucket` are
+    dropped with `split_oversized=False`). If `report` is a dict it is filled
+    with pair, split and drop counts once the generator is exhausted.
+    """
+    records = list(records)
+    if components is None:
+        components = record_components(records, ignore_common_domains=ignore_common_domains)
+    keys = [_pass_key(c, key) for c in components]
+    stats = report if report is not None else {}
+    stats.update(_new_pass_report())
+    refine = components if split_oversized else None
+    for i, j in _bucket_index_pairs(keys, max_bucket, refine, stats):
+        yield records[i], records[j]
+
+
+def _index_array(index_pairs):
+    # (n, 2) int32 array from a generator of (i, j) tuples, without a list of tuples
+    flat = np.fromiter(chain.from_iterable(index_pairs), dtype=np.int32)
+    return flat.reshape(-1, 2)
+
+
+def merge_candidate_index(records, max_bucket=1000, ignore_common_domains=True, lsh=None,
+                          neighbourhood=None, qgram=None, phonetic=False, split_oversized=True,
+                          report=None, table=None, ids=None, dedup="email"):
+    """
+    Record positions of the merge_candidates pairs as two int32 arrays.
+
+    Every pass is collected into an (n, 2) array, the passes are
+    concatenated, and pairs are deduplicated by their lowercased email pair
+    via np.unique on one packed 64-bit key per pair (the two email codes,
+    smaller one in the high half). The first occurrence of each key is kept
+    and the original order is preserved, so the result matches
+    merge_candidates exactly. Accepts the same options and `report`;
+    `table` and `ids` are a record_table of `records` the caller already has.
+
+    With dedup="position" pairs are deduplicated by their record positions
+    instead, for callers whose records are (name, email) identities: name
+    variants sharing an email are then separate pairs.
+    """
+    if dedup not in ("email", "position"):
+        raise ValueError(f"Unknown dedup mode: {dedup}")
+    records = list(records)
+    if table is None:
+        table, ids = record_table(records)
+    components = record_components(records, ignore_common_domains=ignore_common_domains,
+                                   table=table, ids=ids)
+    refine = components if split_oversized else None
+    if report is None:
+        report = {}
+    index_passes = []
+    for key in KEY_PASSES:
+        stats = report.setdefault("|".join(key), _new_pass_report())
+        keys = [_pass_key(c, key) for c in components]
+        index_passes.append((stats, _bucket_index_pairs(keys, max_bucket, refine, stats)))
+    if phonetic:
+        stats = report.setdefault("|".join(PHONETIC_PASS), _new_pass_report())
+        keys = [_join_key(c, PHONETIC_PASS) if c["metaphone_last"] else None for c in components]
+        index_passes.append((stats, _bucket_index_pairs(keys, max_bucket, refine, stats)))
+    if lsh:
+        params = {} if lsh is True else dict(lsh)
+        params.setdefault("max_bucket", max_bucket)
+        stats = report.setdefault("minhash", _new_pass_report())
+        index_passes.append((stats, _minhash_index_pairs(
+            table, ids, params.get("bands", 16), params.get("rows", 4),
+            params.get("ngram", 3), params.get("seed", 0), params["max_bucket"], stats,
+        )))
+    if neighbourhood:
+        params = {} if neighbourhood is True else dict(neighbourhood)
+        stats = report.setdefault("neighbourhood", _new_pass_report())
+        index_passes.append((stats, _neighbourhood_index_pairs(
+            table, ids, params.get("keys", ("name", "reversed_name", "local", "gh_handle")),
+            params.get("window", 5), stats,
+        )))
+    if qgram:
+        params = {} if qgram is True else dict(qgram)
+        stats = report.setdefault("qgram", _new_pass_report())
+        index_passes.append((stats, _qgram_index_pairs(
+            table, ids, params.get("threshold", 0.5), params.get("ngram", 3), stats,
+        )))
+
+    arrays = [_index_array(index_pairs) for _, index_pairs in index_passes]
+    pairs = np.concatenate(arrays) if arrays else np.empty((0, 2), dtype=np.int32)
+    source = np.repeat(np.arange(len(arrays)), [len(a) for a in arrays])
+
+    if dedup == "email":
+        codes, _ = pd.factorize(pd.Series([r["email"] for r in records], dtype=object).str.lower())
+    else:
+        codes = np.arange(len(records))
+    ea = codes[pairs[:, 0]].astype(np.uint64)
+    eb = codes[pairs[:, 1]].astype(np.uint64)
+    packed = (np.minimum(ea, eb) << np.uint64(32)) | np.maximum(ea, eb)
+    _, first = np.unique(packed, return_index=True)
+    first.sort()
+
+    new_pairs = np.bincount(source[first], minlength=len(arrays))
+    for (stats, _), count in zip(index_passes, new_pairs.tolist()):
+        stats["new_pairs"] = count
+    instrumentation.record_blocking(report)
+    return pairs[first, 0], pairs[first, 1]
+
+
+def merge_candidate_pairs(records, **kwargs):
+    """
+    Candidate pairs of merge_candidates as identity ids: returns the
+    identity table of `records` and two int32 arrays (left, right) of row
+    positions in it. Strings are only needed again at output time, see
+    candidate_frame; the arrays can go straight to features.pair_features.
+    Keyword arguments are those of merge_candidate_index.
+    """
+    records = list(records)
+    table, ids = record_table(records)
+    left, right = merge_candidate_index(records, table=table, ids=ids, **kwargs)
+    ids = ids.astype(np.int32)
+    return table, ids[left], ids[right]
+
+
+def candidate_frame(table, left, right):
+    """name_1/email_1/name_2/email_2 frame of identity id pairs."""
+    names = table["name"].to_numpy(dtype=object)
+    emails = table["email"].to_numpy(dtype=object)
+    return pd.DataFrame({
+        "name_1": names[left], "email_1": emails[left],
+        "name_2": names[right], "email_2": emails[right],
+    })
+
+
+def merge_candidates(records, max_bucket=1000, ignore_common_domains=True, lsh=None,
+                     neighbourhood=None, qgram=None, phonetic=False, split_oversized=True,
+                     report=None):
+    """
+    Union of the key-based blocking passes, deduplicated by email pair.
+
+    `lsh` adds a MinHash pass after the key passes: True for the defaults of
+    minhash_candidates, or a dict of its keyword arguments (bands, rows,
+    ngram, seed). `neighbourhood` likewise adds a sorted-neighbourhood pass
+    (keys, window of sorted_neighbourhood_candidates) and `qgram` a q-gram
+    similarity join (threshold, ngram of qgram_candidates). `phonetic`
+    adds a key pass on PHONETIC_PASS (metaphone of the last name and first
+    initial; identities without a last name are left out) right after the
+    key passes. Oversized buckets are handled as in make_candidates.
+
+    If `report` is a dict it is filled, per pass ("domain|lastname_initial",
+    ..., "metaphone_last|first_initial", "minhash", "neighbourhood", "qgram"),
+    with the pairs the pass
+    produced, how many of them were new after deduplication, and the
+    split/dropped bucket and dropped pair counts.
+
+    Yields record pairs; see merge_candidate_index and merge_candidate_pairs
+    for the compact array forms.
+    """
+    records = list(records)
+    left, right = merge_candidate_index(
+        records, max_bucket=max_bucket, ignore_common_domains=ignore_common_domains, lsh=lsh,
+        neighbourhood=neighbourhood, qgram=qgram, phonetic=phonetic,
+        split_oversized=split_oversized, report=report,
+    )
+    for i, j in zip(left.tolist(), right.tolist()):
+        yield records[i], records[j]
@@ -0,0 +1,208 @@
+import heapq
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from src.identities import pair_identity_ids
+from src.tables import read_table, write_table
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with union by size and path halving."""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b, max_size=None):
+        """Merge the sets of a and b; returns False if they were not merged."""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        if max_size is not None and self.size[ra] + self.size[rb] > max_size:
+            return False
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return True
+
+    def labels(self):
+        """Cluster label per element, numbered by the smallest member."""
+        roots = np.array([self.find(x) for x in range(len(self.parent))], dtype=np.int64)
+        return _relabel(roots)
+
+
+def _relabel(groups):
+    # 0..k-1 labels ordered by the first element of each group
+    _, first, inverse = np.unique(groups, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    return rank[inverse.ravel()]
+
+
+def connected_components(n, left, right, scores=None, max_cluster_size=None):
+    """
+    Cluster label of each of the n nodes given edges (left[k], right[k]).
+
+    With `max_cluster_size` the edges are merged in descending `scores`
+    order and a merge that would create a larger cluster is skipped, so
+    weak links are the ones left out of oversized clusters.
+    """
+    uf = UnionFind(n)
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    if max_cluster_size is not None and scores is not None:
+        order = np.argsort(-np.asarray(scores, dtype=float), kind="stable")
+        left, right = left[order], right[order]
+    for a, b in zip(left.tolist(), right.tolist()):
+        uf.union(a, b, max_cluster_size)
+    return uf.labels()
+
+
+def correlation_split(nodes, weights):
+    """
+    Split one cluster by greedy additive edge contraction, a correlation
+    clustering heuristic: starting from singletons, repeatedly merge the two
+    groups with the largest positive total weight between them.
+
+    `weights` maps (u, v) node pairs to signed weights (positive = same
+    identity). Returns a list of groups (lists of nodes).
+    """
+    rep = {v: v for v in nodes}
+    members = {v: [v] for v in nodes}
+    between = defaultdict(dict)
+    for (u, v), w in weights.items():
+        if u == v:
+            continue
+        between[u][v] = between[u].get(v, 0.0) + w
+        between[v][u] = between[v].get(u, 0.0) + w
+
+    heap = [(-w, u, v) for u in between for v, w in between[u].items() if u < v and w > 0]
+    heapq.heapify(heap)
+    while heap:
+        neg, u, v = heapq.heappop(heap)
+        if rep[u] != u or rep[v] != v or between[u].get(v) != -neg:
+            continue  # stale entry
+        # merge v into u
+        if len(members[u]) < len(members[v]):
+            u, v = v, u
+        for x in members[v]:
+            rep[x] = u
+        members[u].extend(members.pop(v))
+        for x, w in between.pop(v).items():
+            del between[x][v]
+            if x == u:
+                continue
+            total = between[u].get(x, 0.0) + w
+            between[u][x] = total
+            between[x][u] = total
+            if total > 0:
+                a, b = (u, x) if u < x else (x, u)
+                heapq.heappush(heap, (-total, a, b))
+    return list(members.values())
+
+
+def _split_weak_clusters(labels, left, right, scores, threshold, min_internal_score):
+    # re-cluster every cluster whose mean internal score is below the limit
+    same = labels[left] == labels[right]
+    if not same.any():
+        return labels, 0
+    cluster = labels[left[same]]
+    total = np.bincount(cluster, weights=scores[same], minlength=labels.max() + 1)
+    count = np.bincount(cluster, minlength=labels.max() + 1)
+    weak = np.flatnonzero((count > 0) & (total < min_internal_score * count))
+    if len(weak) == 0:
+        return labels, 0
+
+    groups = labels.copy()
+    next_label = labels.max() + 1
+    inside = same & np.isin(labels[left], weak)
+    weights = defaultdict(dict)
+    for a, b, s in zip(left[inside].tolist(), right[inside].tolist(), scores[inside].tolist()):
+        weights[int(labels[a])][(a, b)] = s - threshold
+    for c in weak.tolist():
+        nodes = np.flatnonzero(labels == c).tolist()
+        for group in correlation_split(nodes, weights[c])[1:]:
+            groups[group] = next_label
+            next_label += 1
+    return _relabel(groups), len(weak)
+
+
+def cluster_pairs(df, threshold=0.5, proba_col="proba", max_cluster_size=None,
+                  min_internal_score=None):
+    """
+    Resolve scored pairs into identity clusters.
+
+    Pairs with `proba_col` >= `threshold` are edges of a union-find over the
+    (name, email) identities of `df`. Guardrails, both off by default:
+      - max_cluster_size: edges are merged strongest first and merges that
+        would exceed the size are skipped.
+      - min_internal_score: clusters whose mean score over all their scored
+        internal pairs (below-threshold ones included) is lower are split by
+        correlation clustering with weights proba - threshold.
+
+    Returns (assignments, stats). `assignments` has one row per identity
+    with its cluster_id and the canonical (name, email) of the cluster, the
+    member with the most edges. `stats` has one row per cluster with its
+    size, edge count and mean/min edge score.
+    """
+    table, left, right = pair_identity_ids(df)
+    scores = df[proba_col].to_numpy(dtype=float)
+    edge = scores >= threshold
+
+    labels = connected_components(len(table), left[edge], right[edge], scores[edge],
+                                  max_cluster_size=max_cluster_size)
+    if min_internal_score is not None and len(table):
+        labels, _ = _split_weak_clusters(labels, left, right, scores, threshold,
+                                         min_internal_score)
+
+    kept = edge & (labels[left] == labels[right])
+    degree = np.bincount(np.concatenate([left[kept], right[kept]]), minlength=len(table))
+
+    assignments = pd.DataFrame({
+        "name": table["name"].to_numpy(dtype=object),
+        "email": table["email"].to_numpy(dtype=object),
+        "cluster_id": labels,
+        "degree": degree,
+    })
+    canonical = (assignments.sort_values("degree", ascending=False, kind="stable")
+                 .drop_duplicates("cluster_id")
+                 .set_index("cluster_id"))
+    assignments["canonical_name"] = assignments["cluster_id"].map(canonical["name"])
+    assignments["canonical_email"] = assignments["cluster_id"].map(canonical["email"])
+    assignments["cluster_size"] = assignments.groupby("cluster_id")["name"].transform("size")
+    assignments = assignments.drop(columns="degree")
+
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    edge_cluster = labels[left[kept]]
+    edge_scores = scores[kept]
+    stats = pd.DataFrame({
+        "cluster_id": np.arange(n_clusters),
+        "size": np.bincount(labels, minlength=n_clusters),
+        "edges": np.bincount(edge_cluster, minlength=n_clusters),
+    })
+    per_cluster = pd.Series(edge_scores).groupby(edge_cluster)
+    stats["mean_proba"] = stats["cluster_id"].map(per_cluster.mean())
+    stats["min_proba"] = stats["cluster_id"].map(per_cluster.min())
+    return assignments, stats
+
+
+def cluster_scored_csv(scored_csv, out_csv, stats_csv=None, threshold=0.5, **kwargs):
+    df = read_table(scored_csv)
+    assignments, stats = cluster_pairs(df, threshold=threshold, **kwargs)
+    write_table(assignments, out_csv)
+    if stats_csv is not None:
+        write_table(stats, stats_csv)
+
+    merged = stats[stats["size"] > 1]
+    print(f"identities={len(assignments)}  clusters={len(stats)}  "
+          f"merged clusters={len(merged)}  largest={int(stats['size'].max()) if len(stats) else 0}")
+    print(f"output: {out_csv}")
+    return assignments, stats
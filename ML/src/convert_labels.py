@@ -1,5 +1,6 @@
 import pandas as pd
 from pathlib import Path
+from src.tables import write_table
 
 def convert_to_float(value):
     try:
@@ -130,7 +131,7 @@ def parse_excel(input_xlsx, output_labels_csv, output_candidates_csv):
     # labels
     labels = base[["name_1", "email_1", "name_2", "email_2", "label"]].copy()
     Path(output_labels_csv).parent.mkdir(parents=True, exist_ok=True)
-    labels.to_csv(output_labels_csv, index=False)
+    write_table(labels, output_labels_csv)
 
     # candidates
     candidate_columns = [
@@ -141,7 +142,7 @@ def parse_excel(input_xlsx, output_labels_csv, output_candidates_csv):
     candidates["method"] = "bird_sheet"
 
     Path(output_candidates_csv).parent.mkdir(parents=True, exist_ok=True)
-    candidates.to_csv(output_candidates_csv, index=False)
+    write_table(candidates, output_candidates_csv)
 
     print(f"Output saved: {output_labels_csv}")
     print(f"Output saved: {output_candidates_csv}")
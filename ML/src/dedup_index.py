@@ -0,0 +1,246 @@
+import os
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import joblib
+from src import instrumentation
+from src.blocking import KEY_PASSES, REFINEMENTS, _pass_key, _new_pass_report, record_components, candidate_frame
+from src.clustering import UnionFind
+from src.features import pair_features
+from src.identities import build_identity_table
+from src.tables import read_columns, iter_table, read_table, write_table
+
+
+class DedupIndex:
+    """
+    Persisted resolution state for incremental deduplication.
+
+    Keeps the preprocessed identity table, the blocking buckets of every key
+    pass of blocking.merge_candidates and a union-find over the identities.
+    `add` blocks only the new identities against the index (and each
+    other), scores just those pairs and merges the matches into the
+    existing clusters, so the cost of an update grows with the number of
+    new identities and the size of their buckets, not with the index.
+
+    Bucket sizes are checked when an identity is added, so identities that
+    joined a bucket while it was still below max_bucket were paired with all
+    of it; a batch run over the same identities yields a subset of the pairs.
+    """
+
+    def __init__(self, threshold=0.5, max_bucket=1000, ignore_common_domains=True):
+        self.threshold = threshold
+        self.max_bucket = max_bucket
+        self.ignore_common_domains = ignore_common_domains
+        self.table = build_identity_table([], [])
+        self.components = []
+        self.buckets = {"|".join(key): defaultdict(list) for key in KEY_PASSES}
+        self.uf = UnionFind(0)
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def bucket_candidates(self, comps, max_bucket=None, report=None):
+        """
+        Ids of the indexed identities sharing a bucket with blocking
+        components `comps`; buckets above `max_bucket` (default: the index's)
+        are narrowed by the blocking refinements like _split_bucket does.
+        An id can appear once per pass. If `report` is a dict, the pairs of
+        every pass and the split/dropped buckets are added to it as in
+        blocking.merge_candidates.
+        """
+        if max_bucket is None:
+            max_bucket = self.max_bucket
+        found = []
+        for key in KEY_PASSES:
+            k = _pass_key(comps, key)
+            if k is None:
+                continue
+            members = self.buckets["|".join(key)].get(k, [])
+            level = 0
+            while len(members) > max_bucket and level < len(REFINEMENTS):
+                ref = REFINEMENTS[level]
+                members = [m for m in members if self.components[m][ref] == comps[ref]]
+                level += 1
+            stats = None
+            if report is not None:
+                stats = report.setdefault("|".join(key), _new_pass_report())
+                stats["split_buckets"] += level > 0
+            if len(members) <= max_bucket:
+                found.extend(members)
+                if stats is not None:
+                    stats["pairs"] += len(members)
+            elif stats is not None:
+                stats["dropped_buckets"] += 1
+                stats["dropped_pairs"] += len(members)
+        return found
+
+    def _add_to_buckets(self, i, comps):
+        for key in KEY_PASSES:
+            k = _pass_key(comps, key)
+            if k is not None:
+                self.buckets["|".join(key)][k].append(i)
+
+    def _insert(self, names, emails):
+        # append the identities not yet indexed; returns their ids
+        new = build_identity_table(names, emails)
+        keep = [(n, e) not in self._positions for n, e in zip(new["name"], new["email"])]
+        new = new[keep]
+        start = len(self.table)
+        ids = list(range(start, start + len(new)))
+        if not ids:
+            return ids
+
+        self.table = pd.concat([self.table, new], ignore_index=True)
+        records = [{"name": n, "email": e} for n, e in zip(new["name"], new["email"])]
+        self.components.extend(record_components(
+            records, ignore_common_domains=self.ignore_common_domains))
+        self.uf.parent.extend(ids)
+        self.uf.size.extend([1] * len(ids))
+        for i, (n, e) in zip(ids, zip(new["name"], new["email"])):
+            self._positions[(n, e)] = i
+        return ids
+
+    def add(self, names, emails, model):
+        """
+        Index new (name, email) identities, score them against their blocking
+        candidates with `model` and merge pairs with proba >= threshold.
+
+        Identities already in the index are ignored. Returns the scored
+        pairs as a name_1/email_1/name_2/email_2/proba frame.
+        """
+        new_ids = self._insert(names, emails)
+        left, right = [], []
+        report = {}
+        for i in new_ids:
+            for j in self.bucket_candidates(self.components[i], report=report):
+                left.append(j)
+                right.append(i)
+            comps = self.components[i]
+            self._add_to_buckets(i, comps)
+
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        packed = np.unique((left << 32) | right)
+        left, right = packed >> 32, packed & 0xFFFFFFFF
+        instrumentation.record_blocking(report)
+
+        scored = candidate_frame(self.table, left, right)
+        if len(scored) == 0:
+            scored["proba"] = pd.Series(dtype=float)
+            return scored
+
+        # featurize on the sub-table of the identities involved only
+        involved, inverse = np.unique(np.concatenate([left, right]), return_inverse=True)
+        sub = self.table.iloc[involved].reset_index(drop=True)
+        X = pair_features(sub, inverse[:len(left)], inverse[len(left):])
+        scored["proba"] = model.predict_proba(X)[:, 1]
+
+        match = scored["proba"].to_numpy() >= self.threshold
+        for a, b in zip(left[match].tolist(), right[match].tolist()):
+            self.uf.union(a, b)
+        return scored
+
+    def add_identities(self, names, emails):
+        """Index identities as singletons, without scoring them."""
+        for i in self._insert(names, emails):
+            self._add_to_buckets(i, self.components[i])
+
+    def add_clusters(self, assignments):
+        """
+        Seed the index with already resolved identities: a frame with name,
+        email and cluster_id columns (e.g. the clustering output). Members of
+        one cluster_id are merged without scoring.
+        """
+        ids = self._insert(assignments["name"], assignments["email"])
+        for i in ids:
+            comps = self.components[i]
+            self._add_to_buckets(i, comps)
+
+        first = {}
+        names = assignments["name"].fillna("").astype(str)
+        emails = assignments["email"].fillna("").astype(str)
+        for n, e, c in zip(names, emails, assignments["cluster_id"]):
+            i = self._positions[(n, e)]
+            if c in first:
+                self.uf.union(first[c], i)
+            else:
+                first[c] = i
+
+    def clusters(self):
+        """name/email/cluster_id frame of every indexed identity."""
+        return pd.DataFrame({
+            "name": self.table["name"].to_numpy(dtype=object),
+            "email": self.table["email"].to_numpy(dtype=object),
+            "cluster_id": self.uf.labels(),
+        })
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+def table_identities(path, batch_size=100_000):
+    """
+    Unique (name, email) identities of a table, in first-seen order, as a
+    name/email frame. Takes a name/email table or a pair table, whose
+    name_1/email_1 and name_2/email_2 sides are both used; read in batches.
+    """
+    columns = read_columns(path)
+    if {"name", "email"} <= set(columns):
+        sides = [("name", "email")]
+    else:
+        sides = [("name_1", "email_1"), ("name_2", "email_2")]
+    usecols = [c for side in sides for c in side]
+    seen = {}
+    for chunk in iter_table(path, batch_size=batch_size, columns=usecols):
+        for name_col, email_col in sides:
+            names = chunk[name_col].fillna("").astype(str)
+            emails = chunk[email_col].fillna("").astype(str)
+            seen.update(dict.fromkeys(zip(names, emails)))
+    return pd.DataFrame(list(seen), columns=["name", "email"])
+
+
+def update_index(index_pkl, new_devs_csv, model_pkl, out_csv, scored_csv=None,
+                 threshold=None, seed_clusters_csv=None, seed_devs_csv=None):
+    """
+    Incremental run: load (or create) the index, add the identities of
+    `new_devs_csv` (name, email columns), save it and write the clusters.
+
+    A new index is seeded with every identity of `seed_devs_csv` (a devs
+    table or the scored candidate pairs, see table_identities), so
+    developers without any match can still be found by later aliases, and
+    with the clusters of `seed_clusters_csv` as labels; either file is
+    skipped when it does not exist. `threshold` (default 0.5 for a new
+    index) also replaces the threshold of a loaded index; it applies to the
+    pairs scored from now on, earlier merges are kept. Every table can be
+    CSV or Parquet (see tables).
+    """
+    try:
+        index = DedupIndex.load(index_pkl)
+    except FileNotFoundError:
+        index = DedupIndex()
+        if seed_devs_csv is not None and os.path.exists(seed_devs_csv):
+            seed = table_identities(seed_devs_csv)
+            index.add_identities(seed["name"], seed["email"])
+        if seed_clusters_csv is not None and os.path.exists(seed_clusters_csv):
+            index.add_clusters(read_table(seed_clusters_csv))
+    if threshold is not None:
+        index.threshold = threshold
+
+    new = read_table(new_devs_csv, columns=["name", "email"])
+    before = len(index)
+    scored = index.add(new["name"], new["email"], joblib.load(model_pkl))
+    index.save(index_pkl)
+
+    if scored_csv is not None:
+        write_table(scored, scored_csv)
+    clusters = index.clusters()
+    write_table(clusters, out_csv)
+    print(f"new identities={len(index) - before}  scored pairs={len(scored)}  "
+          f"matches={int((scored['proba'] >= index.threshold).sum())}")
+    print(f"output: {out_csv}")
+    return clusters
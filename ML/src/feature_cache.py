@@ -0,0 +1,175 @@
+import hashlib
+import os
+import numpy as np
+from src.features import FEATURE_NAMES, FEATURE_VERSION, pair_features
+from src.identities import pair_identity_ids
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def identity_hashes(table):
+    """64-bit hash of every (name, email) of an identity table."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f"{n}\x1f{e}".encode("utf-8"), digest_size=8).digest(),
+                        "little")
+         for n, e in zip(table["name"], table["email"])),
+        dtype=np.uint64, count=len(table),
+    )
+
+
+def pair_keys(table, left, right):
+    """
+    64-bit key per ordered identity pair, independent of the table it came
+    from, so the same pair gets the same key in every run.
+    """
+    h = identity_hashes(table)
+    a = h[np.asarray(left, dtype=np.int64)]
+    b = h[np.asarray(right, dtype=np.int64)]
+    with np.errstate(over="ignore"):
+        return a * _GOLDEN ^ ((b << np.uint64(17)) | (b >> np.uint64(47)))
+
+
+class FeatureCache:
+    """
+    On-disk cache of pair feature rows, shared by every caller that points
+    at the same directory.
+
+    Rows live in segments under `<cache_dir>/v<FEATURE_VERSION>-<hash of
+    FEATURE_NAMES>/`: a
+    `<segment>.npy` float64 matrix opened with mmap_mode="r" and a
+    `<segment>.keys.npy` array of unique pair_keys, stored sorted so a
+    lookup is a binary search over the memory-mapped keys plus reads of the
+    rows it needs. Pairs not found are computed with pair_features and
+    appended as a new segment; once MERGE_FANOUT segments of the same size
+    class (power of two) exist they are merged into one, so a run that adds
+    one segment per chunk keeps O(log n) segments. Bumping FEATURE_VERSION
+    (or changing FEATURE_NAMES) starts a fresh directory.
+    """
+
+    # segments of one size class merged together
+    MERGE_FANOUT = 4
+
+    def __init__(self, cache_dir):
+        tag = hashlib.blake2b(",".join(FEATURE_NAMES).encode("utf-8"), digest_size=4).hexdigest()
+        self.path = os.path.join(cache_dir, f"v{FEATURE_VERSION}-{tag}")
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _segment_names(self):
+        return sorted(f[:-len(".keys.npy")] for f in os.listdir(self.path) if f.endswith(".keys.npy"))
+
+    def _segments(self):
+        segments = []
+        for name in self._segment_names():
+            base = os.path.join(self.path, name)
+            try:
+                segments.append((name, np.load(base + ".keys.npy", mmap_mode="r"),
+                                 np.load(base + ".npy", mmap_mode="r")))
+            except FileNotFoundError:
+                # merged away by another process since listing
+                continue
+        return segments
+
+    def _write_segment(self, keys, X):
+        name = hashlib.blake2b(keys.tobytes(), digest_size=12).hexdigest()
+        self._publish(name, lambda tmp: np.save(tmp, X), keys)
+        return name
+
+    def _publish(self, name, write_rows, keys):
+        # write_rows(tmp) writes the rows file; each file is written to a
+        # temporary name and moved into place, the keys file last, so a
+        # segment only counts once complete
+        base = os.path.join(self.path, name)
+        for suffix, write in ((".npy", write_rows), (".keys.npy", lambda tmp: np.save(tmp, keys))):
+            tmp = f"{base}.tmp{os.getpid()}{suffix}"
+            write(tmp)
+            os.replace(tmp, base + suffix)
+
+    def _remove_segment(self, name):
+        base = os.path.join(self.path, name)
+        # keys first, so a half-removed segment is never listed
+        for suffix in (".keys.npy", ".npy"):
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+
+    def _merge(self, segments, block=1 << 16):
+        keys = np.concatenate([k for _, k, _ in segments])
+        merged, first = np.unique(keys, return_index=True)
+        name = hashlib.blake2b(merged.tobytes(), digest_size=12).hexdigest()
+
+        def write_rows(tmp):
+            # rows are copied into a memory-mapped file one segment (and at
+            # most `block` rows) at a time, so merging never holds the cache
+            X = np.lib.format.open_memmap(tmp, mode="w+", dtype=float,
+                                          shape=(len(merged), len(FEATURE_NAMES)))
+            start = 0
+            for _, seg_keys, seg_rows in segments:
+                end = start + len(seg_keys)
+                dest = np.flatnonzero((first >= start) & (first < end))
+                for lo in range(0, len(dest), block):
+                    part = dest[lo:lo + block]
+                    X[part] = seg_rows[first[part] - start]
+                start = end
+            X.flush()
+            del X
+
+        self._publish(name, write_rows, merged)
+        for old, _, _ in segments:
+            if old != name:
+                self._remove_segment(old)
+
+    def compact(self):
+        """Merge segments until no size class holds MERGE_FANOUT of them."""
+        while True:
+            classes = {}
+            for segment in self._segments():
+                classes.setdefault(max(len(segment[1]), 1).bit_length(), []).append(segment)
+            full = [segs for segs in classes.values() if len(segs) >= self.MERGE_FANOUT]
+            if not full:
+                return
+            self._merge(full[0])
+
+    def pair_features(self, table, left, right, n_jobs=1):
+        """pair_features for (left[k], right[k]), reusing every cached row."""
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        keys = pair_keys(table, left, right)
+        X = np.empty((len(keys), len(FEATURE_NAMES)), dtype=float)
+        found = np.zeros(len(keys), dtype=bool)
+
+        for _, seg_keys, seg_rows in self._segments():
+            todo = np.flatnonzero(~found)
+            if len(todo) == 0:
+                break
+            if len(seg_keys) == 0:
+                continue
+            # segment keys are sorted and unique (np.unique when written)
+            pos = np.searchsorted(seg_keys, keys[todo])
+            pos = np.minimum(pos, len(seg_keys) - 1)
+            hit = seg_keys[pos] == keys[todo]
+            rows = pos[hit]
+            # sorted reads keep the memmap access sequential
+            sort = np.argsort(rows, kind="stable")
+            X[todo[hit][sort]] = seg_rows[rows[sort]]
+            found[todo[hit]] = True
+
+        missing = np.flatnonzero(~found)
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if len(missing):
+            new_keys, first, inverse = np.unique(keys[missing], return_index=True,
+                                                 return_inverse=True)
+            rows = missing[first]
+            computed = pair_features(table, left[rows], right[rows], n_jobs=n_jobs)
+            X[missing] = computed[inverse.ravel()]
+            self._write_segment(new_keys, computed)
+            self.compact()
+        return X
+
+    def frame_features(self, df, n_jobs=1):
+        """build_features_batch for a candidate frame, through the cache."""
+        table, left, right = pair_identity_ids(df)
+        return self.pair_features(table, left, right, n_jobs=n_jobs)
@@ -1,9 +1,42 @@
+import math
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import jellyfish
+import pandas as pd
+from rapidfuzz import process
 from rapidfuzz.distance import JaroWinkler
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from src.preprocess import normalize_name, split_name, normalize_email
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from src import instrumentation
+from src.preprocess import get_initials
+from src.identities import pair_identity_ids, identity_record
+from src.similarity_cache import jaro_winkler, phonetic_codes
+
+
+# Bump whenever a feature's definition changes; cached feature rows
+# (feature_cache) are only reused within one version
+FEATURE_VERSION = 1
+
+FEATURE_NAMES = [
+    "name_jw",
+    "name_tfidf",
+    "prefix_jw",
+    "first_jw",
+    "last_jw",
+    "phone_first",
+    "phone_last",
+    "same_domain",
+    "firstname_equal",
+    "lastname_equal",
+    "initials_equal",
+    "prefix_has_fl",
+    "prefix_has_fl_rev",
+    "len_sim_name",
+    "len_sim_prefix",
+]
 
 
 def jaro_winkler_sim(a, b):
@@ -11,7 +44,51 @@ def jaro_winkler_sim(a, b):
         a = ""
     if not b:
         b = ""
-    return float(JaroWinkler.normalized_similarity(a, b))
+    return jaro_winkler(a, b)
+
+
+_char_ngrams = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4)).build_analyzer()
+_SINGLE_IDF_SQ = (math.log(3 / 2) + 1) ** 2
+
+
+def char_ngram_counts(s):
+    return Counter(_char_ngrams(s or ""))
+
+
+def ngram_total(counts):
+    """Sum of squared n-gram counts, the norm term pair_tfidf_similarity needs."""
+    return sum(c * c for c in counts.values())
+
+
+def pair_tfidf_similarity(counts_a, counts_b, total_a=None, total_b=None):
+    """
+    Cosine similarity of two n-gram count vectors weighted with the IDF of
+    a two-document corpus, i.e. what fitting TfidfVectorizer on [a, b] gives
+    (smooth idf: ln(3 / (1 + df)) + 1, so 1 for shared n-grams).
+    `total_a`/`total_b` can pass precomputed ngram_total values.
+    """
+    if total_a is None:
+        total_a = ngram_total(counts_a)
+    if total_b is None:
+        total_b = ngram_total(counts_b)
+    if len(counts_b) < len(counts_a):
+        counts_a, counts_b = counts_b, counts_a
+        total_a, total_b = total_b, total_a
+
+    # integer sums are exact; only the final weighting touches floats
+    dot = shared_a = shared_b = 0
+    for gram, count in counts_a.items():
+        other = counts_b.get(gram)
+        if other:
+            dot += count * other
+            shared_a += count * count
+            shared_b += other * other
+
+    norm_a = shared_a + _SINGLE_IDF_SQ * (total_a - shared_a)
+    norm_b = shared_b + _SINGLE_IDF_SQ * (total_b - shared_b)
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return float(dot / (math.sqrt(norm_a) * math.sqrt(norm_b)))
 
 
 def tfidf_similarity(a, b):
@@ -22,10 +99,64 @@ def tfidf_similarity(a, b):
 
     if not a.strip() and not b.strip():
         return 0.0
-    
-    vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4))
-    X = vectorizer.fit_transform([a, b])
-    return float(cosine_similarity(X[0], X[1])[0, 0])
+
+    return pair_tfidf_similarity(char_ngram_counts(a), char_ngram_counts(b))
+
+
+class NameTfidf:
+    """
+    Char n-gram TF-IDF fitted once over all normalized developer names.
+
+    Every distinct name gets one L2-normalized row in `matrix`, so the cosine
+    similarity of any pair is a row-wise dot product and whole arrays of
+    (i, j) index pairs are scored with a single sparse multiply.
+    """
+
+    def __init__(self, ngram_range=(2, 4)):
+        self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=ngram_range)
+        self.index = {}
+        self.matrix = None
+
+    def fit(self, names):
+        unique = list(dict.fromkeys(n or "" for n in names))
+        self.matrix = self.vectorizer.fit_transform(unique).tocsr()
+        self.index = {n: i for i, n in enumerate(unique)}
+        return self
+
+    def rows(self, names):
+        return np.array([self.index[n or ""] for n in names], dtype=np.int64)
+
+    def pair_similarity(self, left, right, batch_size=1 << 20, matrix=None):
+        """
+        Cosine similarity of the rows (left[k], right[k]) of `matrix`
+        (default: the fitted names, see rows; or a transform result).
+        """
+        if matrix is None:
+            matrix = self.matrix
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        out = np.zeros(len(left), dtype=float)
+        for start in range(0, len(left), batch_size):
+            stop = start + batch_size
+            prod = matrix[left[start:stop]].multiply(matrix[right[start:stop]])
+            out[start:stop] = np.asarray(prod.sum(axis=1)).ravel()
+        return out
+
+    def transform(self, names):
+        """One L2-normalized row per name; names outside the corpus are projected."""
+        names = [n or "" for n in names]
+        if all(n in self.index for n in names):
+            return self.matrix[self.rows(names)]
+        return self.vectorizer.transform(names).tocsr()
+
+    def similarity(self, a, b):
+        a, b = a or "", b or ""
+        if a in self.index and b in self.index:
+            i, j = self.rows([a, b])
+            return float(self.pair_similarity([i], [j])[0])
+        # names outside the fitted corpus are projected onto its vocabulary
+        X = self.vectorizer.transform([a, b])
+        return float(X[0].multiply(X[1]).sum())
 
 
 def phonetic_similarity(a, b):
@@ -33,8 +164,10 @@ def phonetic_similarity(a, b):
         a = ""
     if not b:
         b = ""
-    same_soundex = jellyfish.soundex(a) == jellyfish.soundex(b)
-    same_metaphone = jellyfish.metaphone(a) == jellyfish.metaphone(b)
+    soundex_a, metaphone_a = phonetic_codes(a)
+    soundex_b, metaphone_b = phonetic_codes(b)
+    same_soundex = soundex_a == soundex_b
+    same_metaphone = metaphone_a == metaphone_b
     if same_soundex and same_metaphone:
         return 1.0
     elif same_soundex or same_metaphone:
@@ -43,15 +176,6 @@ def phonetic_similarity(a, b):
         return 0.0
 
 
-def get_initials(name):
-    name = normalize_name(name)
-    parts = name.split()
-    initials = ""
-    for p in parts:
-        initials += p[0]
-    return initials
-
-
 def prefix_contains_name(first, last, prefix):
     if not first or not last:
         return 0
@@ -61,35 +185,53 @@ def prefix_contains_name(first, last, prefix):
         return 0
 
 
-def build_features(pair1, pair2):
-    
-    name1, email1 = pair1
-    name2, email2 = pair2
+def build_features(pair1, pair2, tfidf=None):
+    """
+    Compute the 15 pair features. If `tfidf` is a fitted NameTfidf, name_tfidf
+    uses its corpus IDF weights instead of the two-document weighting.
+    """
+    r1 = identity_record(*pair1)
+    r2 = identity_record(*pair2)
+
+    n1, n2 = r1["norm_name"], r2["norm_name"]
+    if tfidf is not None:
+        name_tfidf = tfidf.similarity(n1, n2)
+    else:
+        name_tfidf = tfidf_similarity(n1, n2)
+    return record_features(r1, r2, name_tfidf)
 
-    # clean and split the data
-    n1 = normalize_name(name1)
-    n2 = normalize_name(name2)
-    _, p1, d1 = normalize_email(email1)
-    _, p2, d2 = normalize_email(email2)
-    f1, l1 = split_name(name1)
-    f2, l2 = split_name(name2)
+
+def record_features(r1, r2, name_tfidf):
+    """
+    The build_features vector of two identity records (dicts as returned by
+    identities.identity_record) given their name_tfidf value, for callers
+    that keep records preprocessed.
+    """
+    n1, n2 = r1["norm_name"], r2["norm_name"]
+    p1, p2 = r1["local"], r2["local"]
+    d1, d2 = r1["domain"], r2["domain"]
+    f1, l1 = r1["first"], r1["last"]
+    f2, l2 = r2["first"], r2["last"]
 
     feats = {}
 
     feats["name_jw"] = jaro_winkler_sim(n1, n2)
-    feats["name_tfidf"] = tfidf_similarity(n1, n2)
+    feats["name_tfidf"] = name_tfidf
 
     feats["prefix_jw"] = jaro_winkler_sim(p1, p2)
     feats["first_jw"] = jaro_winkler_sim(f1, f2)
     feats["last_jw"] = jaro_winkler_sim(l1, l2)
 
-    feats["phone_first"] = phonetic_similarity(f1, f2)
-    feats["phone_last"] = phonetic_similarity(l1, l2)
+    # same values as phonetic_similarity, from the stored codes
+    feats["phone_first"] = ((r1["soundex_first"] == r2["soundex_first"])
+                            + (r1["metaphone_first"] == r2["metaphone_first"])) / 2
+    feats["phone_last"] = ((r1["soundex_last"] == r2["soundex_last"])
+                           + (r1["metaphone_last"] == r2["metaphone_last"])) / 2
 
     feats["same_domain"] = int(d1 == d2 and d1 != "")
     feats["firstname_equal"] = int(f1 == f2 and f1 != "")
     feats["lastname_equal"] = int(l1 == l2 and l1 != "")
-    feats["initials_equal"] = int(get_initials(name1) == get_initials(name2) and get_initials(name1) != "")
+    feats["initials_equal"] = int(r1["initials"] == r2["initials"] and r1["initials"] != "")
 
     feats["prefix_has_fl"] = prefix_contains_name(f1, l1, p2)
     feats["prefix_has_fl_rev"] = prefix_contains_name(f2, l2, p1)
@@ -103,26 +245,298 @@ def build_features(pair1, pair2):
     else:
         feats["len_sim_prefix"] = 0
 
-    feat_order = [
-        "name_jw",
-        "name_tfidf",
-        "prefix_jw",
-        "first_jw",
-        "last_jw",
-        "phone_first",
-        "phone_last",
-        "same_domain",
-        "firstname_equal",
-        "lastname_equal",
-        "initials_equal",
-        "prefix_has_fl",
-        "prefix_has_fl_rev",
-        "len_sim_name",
-        "len_sim_prefix",
-    ]
-
     values = []
-    for key in feat_order:
+    for key in FEATURE_NAMES:
         values.append(feats[key])
 
     return np.array(values, dtype=float)
+
+
+def _jw_columns(a, b):
+    if len(a) == 0:
+        return np.zeros(0, dtype=float)
+    # the scalar normalized_similarity is 1 - normalized_distance; computing it
+    # the same way keeps the batch values bit-identical to jaro_winkler_sim
+    dist = process.cpdist(list(a), list(b), scorer=JaroWinkler.normalized_distance,
+                          dtype=np.float64)
+    return 1 - dist
+
+
+def _tfidf_columns(ident, left, right, batch_size=1 << 18):
+    # same integer sums as pair_tfidf_similarity, done as sparse row products
+    ngrams = ident["ngrams"]
+    totals = ident["ngram_totals"]
+    out = np.zeros(len(left), dtype=float)
+    for start in range(0, len(left), batch_size):
+        l = left[start:start + batch_size]
+        r = right[start:start + batch_size]
+        a = ngrams[l]
+        b = ngrams[r]
+        dot = np.asarray(a.multiply(b).sum(axis=1)).ravel()
+        shared_a = np.asarray(a.multiply(a).multiply(b > 0).sum(axis=1)).ravel()
+        shared_b = np.asarray(b.multiply(b).multiply(a > 0).sum(axis=1)).ravel()
+        norm_a = shared_a + _SINGLE_IDF_SQ * (totals[l] - shared_a)
+        norm_b = shared_b + _SINGLE_IDF_SQ * (totals[r] - shared_b)
+        ok = (norm_a != 0) & (norm_b != 0)
+        out[start:start + len(l)][ok] = dot[ok] / (np.sqrt(norm_a[ok]) * np.sqrt(norm_b[ok]))
+
+    blank = ident["name_blank"]
+    out[blank[left] & blank[right]] = 0.0
+    return out
+
+
+def _phonetic_columns(soundex, metaphone, left, right):
+    # integer codes from _identity_arrays, so these are plain int compares
+    same_soundex = soundex[left] == soundex[right]
+    same_metaphone = metaphone[left] == metaphone[right]
+    return (same_soundex.astype(float) + same_metaphone.astype(float)) / 2
+
+
+def _codes(values):
+    # one int32 code per distinct string of an identity column
+    codes, _ = pd.factorize(values)
+    return codes.astype(np.int32)
+
+
+def _equal_columns(values, left, right):
+    a = values[left]
+    return ((a == values[right]) & (a != "")).astype(float)
+
+
+def _prefix_contains_columns(first, last, prefix):
+    return np.array([prefix_contains_name(f, l, p) for f, l, p in zip(first, last, prefix)],
+                    dtype=float)
+
+
+def _len_sim_columns(lengths, left, right):
+    len_a = lengths[left]
+    len_b = lengths[right]
+    longest = np.maximum(len_a, len_b)
+    out = np.zeros(len(left), dtype=float)
+    nonzero = longest > 0
+    out[nonzero] = 1 - np.abs(len_a - len_b)[nonzero] / longest[nonzero]
+    return out
+
+
+def _lengths(values):
+    return np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+
+
+def fit_identity_ngrams(table):
+    """
+    identity_ngrams of the table and its vocabulary (n-gram -> column), for
+    mapping names outside the table onto the same columns.
+    """
+    names = list(table["norm_name"])
+    vectorizer = CountVectorizer(analyzer=_char_ngrams, dtype=np.int64)
+    try:
+        return vectorizer.fit_transform(names).tocsr(), vectorizer.vocabulary_
+    except ValueError:
+        # no name in the table has any n-gram
+        return sparse.csr_matrix((len(names), 1), dtype=np.int64), {}
+
+
+def identity_ngrams(table):
+    """Sparse char n-gram count matrix with one row per identity of the table."""
+    return fit_identity_ngrams(table)[0]
+
+
+def _identity_arrays(table, ngrams=None):
+    # everything pair_features needs per identity, as plain arrays
+    if ngrams is None:
+        ngrams = identity_ngrams(table)
+    ident = {c: table[c].to_numpy(dtype=object) for c in table.columns}
+    for c in ("soundex_first", "metaphone_first", "soundex_last", "metaphone_last"):
+        ident[c + "_code"] = _codes(ident[c])
+    ident["ngrams"] = ngrams
+    ident["ngram_totals"] = np.asarray(ngrams.multiply(ngrams).sum(axis=1)).ravel()
+    ident["name_blank"] = np.array([not n.strip() for n in ident["norm_name"]], dtype=bool)
+    ident["name_len"] = _lengths(ident["norm_name"])
+    ident["prefix_len"] = _lengths(ident["local"])
+    return ident
+
+
+def _pair_features(ident, left, right, name_tfidf=None):
+    name = ident["norm_name"]
+    prefix = ident["local"]
+    first = ident["first"]
+    last = ident["last"]
+
+    # one thunk per column, so each is timed (and freed) on its own
+    columns = {
+        "name_jw": lambda: _jw_columns(name[left], name[right]),
+        "name_tfidf": lambda: (_tfidf_columns(ident, left, right) if name_tfidf is None
+                               else name_tfidf),
+        "prefix_jw": lambda: _jw_columns(prefix[left], prefix[right]),
+        "first_jw": lambda: _jw_columns(first[left], first[right]),
+        "last_jw": lambda: _jw_columns(last[left], last[right]),
+        "phone_first": lambda: _phonetic_columns(ident["soundex_first_code"],
+                                                 ident["metaphone_first_code"], left, right),
+        "phone_last": lambda: _phonetic_columns(ident["soundex_last_code"],
+                                                ident["metaphone_last_code"], left, right),
+        "same_domain": lambda: _equal_columns(ident["domain"], left, right),
+        "firstname_equal": lambda: _equal_columns(first, left, right),
+        "lastname_equal": lambda: _equal_columns(last, left, right),
+        "initials_equal": lambda: _equal_columns(ident["initials"], left, right),
+        "prefix_has_fl": lambda: _prefix_contains_columns(first[left], last[left], prefix[right]),
+        "prefix_has_fl_rev": lambda: _prefix_contains_columns(first[right], last[right],
+                                                              prefix[left]),
+        "len_sim_name": lambda: _len_sim_columns(ident["name_len"], left, right),
+        "len_sim_prefix": lambda: _len_sim_columns(ident["prefix_len"], left, right),
+    }
+
+    timed = instrumentation.active() is not None
+    X = np.empty((len(left), len(FEATURE_NAMES)), dtype=float)
+    for k, key in enumerate(FEATURE_NAMES):
+        if timed:
+            start = time.perf_counter()
+            X[:, k] = columns[key]()
+            instrumentation.record_feature_time(key, time.perf_counter() - start)
+        else:
+            X[:, k] = columns[key]()
+    return X
+
+
+def identity_arrays(table):
+    """
+    Per-identity arrays of a table for query_pair_features, computed once:
+    returns (arrays, vocabulary of their name n-grams).
+    """
+    ngrams, vocabulary = fit_identity_ngrams(table)
+    return _identity_arrays(table, ngrams), vocabulary
+
+
+def query_pair_features(ident, vocabulary, record, rows):
+    """
+    Feature rows of one identity record (identities.identity_record)
+    against the identities `rows` of `ident` (see identity_arrays), the
+    record on the left as in build_features. Only the record and the rows
+    are gathered, so the cost grows with len(rows), not with the table.
+    N-grams of the record missing from `vocabulary` cannot be shared with
+    any row and only count towards its norm.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    sub = {}
+    for c in ("norm_name", "local", "first", "last", "domain", "initials",
+              "soundex_first", "metaphone_first", "soundex_last", "metaphone_last"):
+        values = np.empty(len(rows) + 1, dtype=object)
+        values[0] = record[c]
+        values[1:] = ident[c][rows]
+        sub[c] = values
+    # few rows: compare the phonetic strings directly instead of factorizing
+    for c in ("soundex_first", "metaphone_first", "soundex_last", "metaphone_last"):
+        sub[c + "_code"] = sub[c]
+    sub["name_len"] = np.concatenate([[len(record["norm_name"])], ident["name_len"][rows]])
+    sub["prefix_len"] = np.concatenate([[len(record["local"])], ident["prefix_len"][rows]])
+
+    name_tfidf = _query_tfidf_column(ident, vocabulary, record["norm_name"], rows)
+    return _pair_features(sub, np.zeros(len(rows), dtype=np.int64),
+                          np.arange(1, len(rows) + 1, dtype=np.int64), name_tfidf=name_tfidf)
+
+
+def _query_tfidf_column(ident, vocabulary, norm_name, rows):
+    # _tfidf_columns of one name against `rows`, read straight off the CSR
+    # arrays: the same integer sums, without building sparse matrices
+    counts = char_ngram_counts(norm_name)
+    ngrams = ident["ngrams"]
+    query = np.zeros(ngrams.shape[1], dtype=np.int64)
+    for g, c in counts.items():
+        j = vocabulary.get(g)
+        if j is not None:
+            query[j] = c
+
+    starts = ngrams.indptr[rows]
+    sizes = ngrams.indptr[rows + 1] - starts
+    seg = np.repeat(np.arange(len(rows)), sizes)
+    pos = np.arange(len(seg)) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(starts, sizes)
+    b = ngrams.data[pos]
+    a = query[ngrams.indices[pos]]
+    shared = a > 0
+    dot = np.bincount(seg, a * b, minlength=len(rows))
+    shared_a = np.bincount(seg, a * a, minlength=len(rows))
+    shared_b = np.bincount(seg, b * b * shared, minlength=len(rows))
+
+    norm_a = shared_a + _SINGLE_IDF_SQ * (ngram_total(counts) - shared_a)
+    norm_b = shared_b + _SINGLE_IDF_SQ * (ident["ngram_totals"][rows] - shared_b)
+    out = np.zeros(len(rows), dtype=float)
+    ok = (norm_a != 0) & (norm_b != 0)
+    out[ok] = dot[ok] / (np.sqrt(norm_a[ok]) * np.sqrt(norm_b[ok]))
+    if not norm_name.strip():
+        out[ident["name_blank"][rows]] = 0.0
+    return out
+
+
+# Identity arrays of the current pool; set by the pool initializer, which with
+# the fork start method receives them by inheritance rather than by pickling
+_worker_identities = None
+
+
+def _init_worker(ident):
+    global _worker_identities
+    _worker_identities = ident
+
+
+def _worker_pair_features(chunk):
+    left, right, name_tfidf = chunk
+    return _pair_features(_worker_identities, left, right, name_tfidf=name_tfidf)
+
+
+def _resolve_n_jobs(n_jobs):
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+def pair_features(table, left, right, ngrams=None, n_jobs=1, chunk_size=50_000, tfidf=None):
+    """
+    Feature matrix for the identity pairs (left[k], right[k]) of a table from
+    identities.build_identity_table. All per-identity preprocessing comes from
+    the table, so only the pairwise comparisons run per pair.
+
+    By default name_tfidf is the two-document weighting of build_features,
+    which the trained models expect. With `tfidf`, a fitted NameTfidf, it is
+    the corpus-IDF cosine instead (as build_features(tfidf=)): every
+    identity name is transformed once and the pairs are row-wise products.
+
+    With n_jobs > 1 (or -1 for all cores) the pairs are split into chunks of
+    at most `chunk_size` and featurized in a process pool; the identity arrays
+    are handed to each worker once and rows come back in input order.
+    """
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    instrumentation.count("pairs_featurized", len(left))
+    ident = _identity_arrays(table, ngrams)
+
+    name_tfidf = None
+    if tfidf is not None:
+        name_tfidf = tfidf.pair_similarity(left, right, matrix=tfidf.transform(table["norm_name"]))
+
+    n_jobs = _resolve_n_jobs(n_jobs)
+    if n_jobs == 1 or len(left) <= chunk_size:
+        return _pair_features(ident, left, right, name_tfidf=name_tfidf)
+
+    chunks = [
+        (left[start:start + chunk_size], right[start:start + chunk_size],
+         None if name_tfidf is None else name_tfidf[start:start + chunk_size])
+        for start in range(0, len(left), chunk_size)
+    ]
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), mp_context=context,
+                             initializer=_init_worker, initargs=(ident,)) as pool:
+        return np.vstack(list(pool.map(_worker_pair_features, chunks)))
+
+
+def build_features_batch(df, n_jobs=1, tfidf=None):
+    """
+    Column-oriented build_features for a whole candidate frame.
+
+    Takes the name_1/email_1/name_2/email_2 columns and returns an
+    (n_pairs, 15) matrix whose rows are identical to calling build_features
+    on each pair. Missing names/emails are treated as empty strings.
+    `n_jobs` and `tfidf` are passed on to pair_features.
+    """
+    table, left, right = pair_identity_ids(df)
+    return pair_features(table, left, right, n_jobs=n_jobs, tfidf=tfidf)
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import jellyfish
+from src.preprocess import (
+    normalize_name, split_name, normalize_email, get_initials, parse_gh_handle
+)
+from src.similarity_cache import phonetic_codes
+
+IDENTITY_COLUMNS = [
+    "name", "email",
+    "norm_name", "first", "last", "initials", "norm_first", "norm_last",
+    "email_norm", "local", "domain", "gh_handle",
+    "soundex_first", "metaphone_first", "soundex_last", "metaphone_last",
+]
+
+
+def _map_unique(values, fn):
+    # run fn once per distinct value, then broadcast back to the rows
+    mapping = {v: fn(v) for v in pd.unique(np.asarray(values, dtype=object))}
+    return [mapping[v] for v in values]
+
+
+def _clean(values):
+    return pd.Series(values, dtype=object).fillna("").astype(str).to_numpy(dtype=object)
+
+
+def build_identity_table(names, emails):
+    """
+    Preprocess every unique (name, email) once.
+
+    Returns a DataFrame with one row per identity and the columns in
+    IDENTITY_COLUMNS; the row position is the integer identity id used by
+    pair-level code. `first`/`last` come from splitting the raw name (as
+    build_features does), `norm_first`/`norm_last` from the normalized name
+    (as blocking does). Missing values are treated as empty strings.
+    """
+    pairs = pd.DataFrame({"name": _clean(names), "email": _clean(emails)})
+    table = pairs.drop_duplicates(ignore_index=True)
+
+    names = table["name"].to_numpy(dtype=object)
+    emails = table["email"].to_numpy(dtype=object)
+
+    norm_name = _map_unique(names, normalize_name)
+    raw_split = _map_unique(names, split_name)
+    norm_split = _map_unique(norm_name, split_name)
+    email_parts = _map_unique(emails, normalize_email)
+
+    table["norm_name"] = norm_name
+    table["first"] = [f for f, _ in raw_split]
+    table["last"] = [l for _, l in raw_split]
+    table["initials"] = _map_unique(names, get_initials)
+    table["norm_first"] = [f for f, _ in norm_split]
+    table["norm_last"] = [l for _, l in norm_split]
+    table["email_norm"] = [e for e, _, _ in email_parts]
+    table["local"] = [l for _, l, _ in email_parts]
+    table["domain"] = [d for _, _, d in email_parts]
+    table["gh_handle"] = [parse_gh_handle(l, d) for _, l, d in email_parts]
+
+    for part in ("first", "last"):
+        values = table[part].to_numpy(dtype=object)
+        table[f"soundex_{part}"] = _map_unique(values, jellyfish.soundex)
+        table[f"metaphone_{part}"] = _map_unique(values, jellyfish.metaphone)
+
+    return table[IDENTITY_COLUMNS]
+
+
+def identity_record(name, email):
+    """
+    The IDENTITY_COLUMNS of one (name, email) as a dict, computed the same
+    way as a row of build_identity_table.
+    """
+    name = "" if name is None or name != name else str(name)
+    email = "" if email is None or email != email else str(email)
+    norm_name = normalize_name(name)
+    first, last = split_name(name)
+    norm_first, norm_last = split_name(norm_name)
+    email_norm, local, domain = normalize_email(email)
+    soundex_first, metaphone_first = phonetic_codes(first)
+    soundex_last, metaphone_last = phonetic_codes(last)
+    return {
+        "name": name,
+        "email": email,
+        "norm_name": norm_name,
+        "first": first,
+        "last": last,
+        "initials": get_initials(name),
+        "norm_first": norm_first,
+        "norm_last": norm_last,
+        "email_norm": email_norm,
+        "local": local,
+        "domain": domain,
+        "gh_handle": parse_gh_handle(local, domain),
+        "soundex_first": soundex_first,
+        "metaphone_first": metaphone_first,
+        "soundex_last": soundex_last,
+        "metaphone_last": metaphone_last,
+    }
+
+
+def identity_ids(table, names, emails):
+    """Map (name, email) rows onto the integer ids of `table`."""
+    index = pd.MultiIndex.from_arrays([table["name"], table["email"]])
+    ids = index.get_indexer(pd.MultiIndex.from_arrays([_clean(names), _clean(emails)]))
+    if (ids < 0).any():
+        raise KeyError("Some (name, email) pairs are missing from the identity table.")
+    return ids.astype(np.int64)
+
+
+def pair_identity_ids(df):
+    """
+    Build the identity table for a candidate frame with
+    name_1/email_1/name_2/email_2 columns and return (table, left, right).
+    """
+    table = build_identity_table(
+        np.concatenate([_clean(df["name_1"]), _clean(df["name_2"])]),
+        np.concatenate([_clean(df["email_1"]), _clean(df["email_2"])]),
+    )
+    left = identity_ids(table, df["name_1"], df["email_1"])
+    right = identity_ids(table, df["name_2"], df["email_2"])
+    return table, left, right
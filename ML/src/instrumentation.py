@@ -0,0 +1,145 @@
+import cProfile
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Profiler of the running pipeline; set by PipelineProfiler.activate so code
+# deep inside a stage (features, blocking) can report to it without the
+# profiler being passed through every call
+_active = None
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return round(rss / (2 ** 20 if platform.system() == "Darwin" else 2 ** 10), 2)
+
+
+class PipelineProfiler:
+    """
+    Per-stage wall/CPU time and memory of a pipeline run, as a JSON report.
+
+    Wrap each stage in `with profiler.stage(name):`. While a stage runs,
+    features.pair_features adds the cumulative time of every feature column
+    and blocking.merge_candidate_index the pair counts of every blocking pass
+    to it (see record_feature_time and record_blocking). Feature times are
+    only seen for columns computed in this process, i.e. with n_jobs=1.
+
+    Memory is the process's maximum resident set size after the stage, which
+    never decreases; with `trace_memory` the peak of Python allocations
+    during the stage is traced as well, which slows pure-Python code down.
+    With `profile_out` the whole run is profiled with cProfile and the stats
+    dumped there by `close`.
+    """
+
+    def __init__(self, trace_memory=False, profile_out=None):
+        self.trace_memory = trace_memory
+        self.profile_out = profile_out
+        self.stages = []
+        self._current = None
+        self._profile = None
+        self._started = time.perf_counter()
+
+    def activate(self):
+        global _active
+        _active = self
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile_out is not None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def close(self):
+        global _active
+        if _active is self:
+            _active = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.profile_out)
+            self._profile = None
+
+    def __enter__(self):
+        return self.activate()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def stage(self, name):
+        record = {"stage": name, "features": {}, "blocking": {}, "counts": {}}
+        outer = self._current
+        self._current = record
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_s"] = round(time.perf_counter() - wall, 4)
+            record["cpu_s"] = round(time.process_time() - cpu, 4)
+            record["max_rss_mb"] = _max_rss_mb()
+            if self.trace_memory and tracemalloc.is_tracing():
+                record["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            record["features"] = {k: round(v, 4) for k, v in record["features"].items()}
+            self._current = outer
+            self.stages.append(record)
+
+    def count(self, key, n):
+        """Add n to a counter of the current stage (e.g. pairs scored)."""
+        if self._current is not None:
+            counts = self._current["counts"]
+            counts[key] = counts.get(key, 0) + int(n)
+
+    def report(self):
+        return {
+            "total_wall_s": round(time.perf_counter() - self._started, 4),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "profile": self.profile_out,
+            "stages": self.stages,
+        }
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+
+
+def active():
+    """The active PipelineProfiler, or None."""
+    return _active
+
+
+def record_feature_time(name, seconds):
+    if _active is not None and _active._current is not None:
+        features = _active._current["features"]
+        features[name] = features.get(name, 0.0) + seconds
+
+
+def record_blocking(report):
+    """Add a blocking report (pass -> pair counts) to the current stage."""
+    if _active is None or _active._current is None:
+        return
+    blocking = _active._current["blocking"]
+    for name, stats in report.items():
+        total = blocking.setdefault(name, {})
+        for key, value in stats.items():
+            total[key] = total.get(key, 0) + value
+
+
+def count(key, n):
+    if _active is not None:
+        _active.count(key, n)
@@ -1,10 +1,11 @@
 import pandas as pd
-import numpy as np
-from src.features import build_features
+from src.features import build_features_batch, FEATURE_NAMES
+from src.tables import read_table, write_table
+from src.feature_cache import FeatureCache
 
-def build_dataset(candidates_csv, labels_csv, out_csv):
-    cands = pd.read_csv(candidates_csv)
-    labels = pd.read_csv(labels_csv)
+def build_dataset(candidates_csv, labels_csv, out_csv, n_jobs=1, feature_cache=None):
+    cands = read_table(candidates_csv)
+    labels = read_table(labels_csv)
 
     df = pd.merge(
         cands,
@@ -15,24 +16,15 @@ def build_dataset(candidates_csv, labels_csv, out_csv):
     )
 
 
-    feat_list = []
-    for _, row in df.iterrows():
-        pair1 = (row["name_1"], row["email_1"])
-        pair2 = (row["name_2"], row["email_2"])
-        feats = build_features(pair1, pair2)
-        feat_list.append(feats)
-
-    feat_array = np.vstack(feat_list)
-    feat_df = pd.DataFrame(feat_array, columns=[
-        "name_jw", "name_tfidf", "prefix_jw", "first_jw", "last_jw",
-        "phone_first", "phone_last", "same_domain", "firstname_equal",
-        "lastname_equal", "initials_equal", "prefix_has_fl",
-        "prefix_has_fl_rev", "len_sim_name", "len_sim_prefix"
-    ])
+    if feature_cache is not None:
+        feat_array = FeatureCache(feature_cache).frame_features(df, n_jobs=n_jobs)
+    else:
+        feat_array = build_features_batch(df, n_jobs=n_jobs)
+    feat_df = pd.DataFrame(feat_array, columns=FEATURE_NAMES)
 
     feat_df["label"] = df["label"]
 
-    feat_df.to_csv(out_csv, index=False)
+    write_table(feat_df, out_csv)
     print("Output:", out_csv)
 
 if __name__ == "__main__":
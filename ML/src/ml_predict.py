@@ -1,21 +1,36 @@
 import pandas as pd
-import numpy as np
 import joblib
-from src.features import build_features  
+from src import instrumentation
+from src.features import build_features_batch
+from src.feature_cache import FeatureCache
+from src.tables import read_table, read_columns, iter_table, write_table, TableWriter
 
-def score_candidates(candidates_csv, model_pkl, out_csv, threshold=None, topk=None):
-    df = pd.read_csv(candidates_csv).copy()
 
-    feats = []
-    for _, r in df.iterrows():
-        a = (r["name_1"], r["email_1"])
-        b = (r["name_2"], r["email_2"])
-        feats.append(build_features(a, b))
-    X = np.vstack(feats)
+def score_frame(df, model, n_jobs=1, feature_cache=None):
+    if len(df) == 0:
+        df["proba"] = pd.Series(dtype=float)
+        return df
+    if feature_cache is not None:
+        X = feature_cache.frame_features(df, n_jobs=n_jobs)
+    else:
+        X = build_features_batch(df, n_jobs=n_jobs)
+    df["proba"] = model.predict_proba(X)[:, 1]
+    instrumentation.count("pairs_scored", len(df))
+    return df
+
+
+def score_candidates(candidates_csv, model_pkl, out_csv, threshold=None, topk=None, chunksize=None,
+                     n_jobs=1, feature_cache=None):
+    if chunksize is not None:
+        return score_candidates_streaming(candidates_csv, model_pkl, out_csv,
+                                          threshold=threshold, topk=topk, chunksize=chunksize,
+                                          n_jobs=n_jobs, feature_cache=feature_cache)
+    cache = FeatureCache(feature_cache) if feature_cache is not None else None
+
+    df = read_table(candidates_csv).copy()
 
     model = joblib.load(model_pkl)
-    proba = model.predict_proba(X)[:, 1]
-    df["proba"] = proba
+    df = score_frame(df, model, n_jobs=n_jobs, feature_cache=cache)
 
     df = df.sort_values("proba", ascending=False)
 
@@ -26,9 +41,81 @@ def score_candidates(candidates_csv, model_pkl, out_csv, threshold=None, topk=No
     else:
         df_out = df
 
-    df_out.to_csv(out_csv, index=False)
+    write_table(df_out, out_csv)
+    print(f"output: {out_csv}  rows={len(df_out)}")
+
+
+def cut_scored(scored_csv, out_csv, threshold=None, topk=None, chunksize=100_000):
+    """
+    Apply a threshold or top-k cut to a table already scored by
+    score_candidates, without building features or loading the model, so
+    trying another threshold only re-reads the scores. The table is read
+    in chunks of `chunksize` and only the kept rows are held and sorted.
+    """
+    best = None
+    kept = []
+    for chunk in iter_table(scored_csv, batch_size=chunksize):
+        if topk is not None:
+            if best is not None:
+                chunk = pd.concat([best, chunk], ignore_index=True)
+            best = chunk.sort_values("proba", ascending=False, kind="stable").head(int(topk))
+            continue
+        if threshold is not None:
+            chunk = chunk[chunk["proba"] >= float(threshold)]
+        kept.append(chunk)
+
+    if topk is not None:
+        df_out = best if best is not None else pd.DataFrame(columns=read_columns(scored_csv))
+    elif kept:
+        df_out = pd.concat(kept, ignore_index=True)
+        df_out = df_out.sort_values("proba", ascending=False, kind="stable")
+    else:
+        df_out = pd.DataFrame(columns=read_columns(scored_csv))
+
+    write_table(df_out, out_csv)
     print(f"output: {out_csv}  rows={len(df_out)}")
 
+
+def score_candidates_streaming(candidates_csv, model_pkl, out_csv, threshold=None, topk=None,
+                               chunksize=100_000, n_jobs=1, feature_cache=None):
+    """
+    Score candidates chunk by chunk so memory stays O(chunksize + topk).
+    Input and output can be CSV or Parquet (see tables), by file suffix.
+
+    With `topk` only the best k rows seen so far are kept and written sorted
+    by proba at the end. Otherwise each chunk's rows (filtered by `threshold`
+    if given) are appended to `out_csv` as soon as they are scored, so the
+    output keeps the input order instead of being sorted by proba.
+    `n_jobs` parallelizes feature building within each chunk.
+    `feature_cache` is a directory for a feature_cache.FeatureCache, which
+    makes re-scoring the same pairs (e.g. with another threshold) skip
+    feature building.
+    """
+    model = joblib.load(model_pkl)
+    cache = FeatureCache(feature_cache) if feature_cache is not None else None
+    columns = read_columns(candidates_csv) + ["proba"]
+
+    best = None
+    with TableWriter(out_csv, columns) as writer:
+        for chunk in iter_table(candidates_csv, batch_size=chunksize):
+            chunk = score_frame(chunk, model, n_jobs=n_jobs, feature_cache=cache)
+
+            if topk is not None:
+                if best is not None:
+                    chunk = pd.concat([best, chunk], ignore_index=True)
+                best = chunk.sort_values("proba", ascending=False, kind="stable").head(int(topk))
+                continue
+
+            if threshold is not None:
+                chunk = chunk[chunk["proba"] >= float(threshold)]
+            writer.write_frame(chunk)
+
+        if best is not None:
+            writer.write_frame(best)
+
+    print(f"output: {out_csv}  rows={writer.rows}")
+
+
 if __name__ == "__main__":
     score_candidates(
         candidates_csv="devs_similarity.csv",
@@ -36,4 +123,3 @@ if __name__ == "__main__":
         out_csv="22ml_scored_p085.csv",
         threshold=0.916
     )
-
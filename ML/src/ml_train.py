@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
@@ -7,6 +6,7 @@ from sklearn.metrics import (
     classification_report, precision_recall_curve
 )
 import joblib
+from src.tables import read_table
 
 FEAT_COLS = [
     "name_jw", "name_tfidf", "prefix_jw", "first_jw", "last_jw",
@@ -17,7 +17,7 @@ FEAT_COLS = [
 
 
 def load_dataset(csv_path):
-    df = pd.read_csv(csv_path)
+    df = read_table(csv_path)
 
     # label（TP/FP）or y（0/1）
     if "y" in df.columns:
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+
+
+class Stage:
+    """
+    One pipeline step: `run()` reads the `inputs` files and writes the
+    `outputs` files; `params` are the settings that change its result
+    (thresholds, feature version, ...). All must be JSON-serializable.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), params=None):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = dict(params or {})
+
+
+def _file_hash(path, state):
+    # files whose size and mtime match the last run are not read again
+    st = os.stat(path)
+    seen = state.get(path)
+    if seen is not None and seen["size"] == st.st_size and seen["mtime_ns"] == st.st_mtime_ns:
+        return seen["hash"]
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    state[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": h.hexdigest()}
+    return state[path]["hash"]
+
+
+def stage_key(stage, file_state):
+    """Content hash of a stage's parameters and input files."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps({"name": stage.name, "params": stage.params}, sort_keys=True).encode())
+    for path in stage.inputs:
+        h.update(path.encode())
+        h.update(_file_hash(path, file_state).encode())
+    return h.hexdigest()
+
+
+def _load_state(path):
+    if path is None or not os.path.exists(path):
+        return {"files": {}, "stages": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(state, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _outputs_unchanged(stage, last, file_state):
+    # outputs must still be the files the last run wrote
+    for path in stage.outputs:
+        if not os.path.exists(path) or last["outputs"].get(path) != _file_hash(path, file_state):
+            return False
+    return True
+
+
+def run_stages(stages, state_json, force=False, profiler=None):
+    """
+    Run `stages` in order, skipping each one whose parameters and input
+    contents hash the same as when it last ran and whose outputs are still
+    what it wrote then. A stage that runs changes its outputs' hashes, so
+    the stages reading them run too. Hashes are kept in `state_json` and
+    saved after every stage, so an interrupted run resumes where it stopped.
+
+    `force` runs every stage. With a PipelineProfiler each stage is timed
+    in profiler.stage, skipped ones marked "skipped". Returns the names of
+    the stages that ran.
+    """
+    state = _load_state(state_json)
+    files = state.setdefault("files", {})
+    done = state.setdefault("stages", {})
+    ran = []
+    for stage in stages:
+        key = stage_key(stage, files)
+        last = done.get(stage.name)
+        fresh = (not force and last is not None and last["key"] == key
+                 and _outputs_unchanged(stage, last, files))
+        if profiler is None:
+            record = {}
+            if not fresh:
+                stage.run()
+        else:
+            with profiler.stage(stage.name) as record:
+                if not fresh:
+                    stage.run()
+        if fresh:
+            record["skipped"] = True
+            print(f"Skipping {stage.name} (inputs unchanged)")
+            continue
+
+        ran.append(stage.name)
+        done[stage.name] = {
+            "key": key,
+            "outputs": {path: _file_hash(path, files) for path in stage.outputs},
+        }
+        _save_state(state, state_json)
+    return ran
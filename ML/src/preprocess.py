@@ -22,6 +22,14 @@ def split_name(full):
         return parts[0], ""
     return parts[0], parts[-1] 
 
+def get_initials(name):
+    name = normalize_name(name)
+    parts = name.split()
+    initials = ""
+    for p in parts:
+        initials += p[0]
+    return initials
+
 def normalize_email(e):
     if not e:
         return "", "", ""
@@ -43,4 +51,9 @@ def normalize_email(e):
         domain = "gmail.com"
         local = local.split("+", 1)[0].replace(".", "")
 
-    return f"{local}@{domain}", local, domain
\ No newline at end of file
+    return f"{local}@{domain}", local, domain
+
+def parse_gh_handle(local, domain):
+    if domain == "users.noreply.github.com" and "+" in local:
+        return local.split("+", 1)[1]
+    return ""
@@ -0,0 +1,130 @@
+import argparse
+import json
+import math
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import joblib
+from src.blocking import identity_components
+from src.dedup_index import DedupIndex
+from src.features import identity_arrays, query_pair_features
+from src.identities import identity_record
+
+
+class Resolver:
+    """
+    Warm, read-only lookup of single identities against a DedupIndex.
+
+    Everything per identity (the pair_features identity arrays, name n-gram
+    counts, cluster label) is prepared once, and the logistic regression is
+    applied as a dot product with its coefficients, so a query only
+    preprocesses itself and computes the features against its blocking
+    candidates, in one vectorized call. `max_bucket`
+    caps the candidates per blocking pass (via the blocking refinements)
+    to keep queries fast on large indexes.
+    """
+
+    def __init__(self, index, model, threshold=None, max_bucket=50):
+        self.index = index
+        self.threshold = index.threshold if threshold is None else threshold
+        self.max_bucket = max_bucket
+        self.coef = np.asarray(model.coef_, dtype=float).ravel()
+        self.intercept = float(np.asarray(model.intercept_).ravel()[0])
+
+        self.ident, self.vocabulary = identity_arrays(index.table)
+        self.names = index.table["name"].tolist()
+        self.emails = index.table["email"].tolist()
+        self.labels = index.uf.labels().tolist()
+
+    @classmethod
+    def load(cls, index_pkl, model_pkl, **kwargs):
+        return cls(DedupIndex.load(index_pkl), joblib.load(model_pkl), **kwargs)
+
+    def _result(self, ident, proba):
+        return {
+            "cluster_id": self.labels[ident],
+            "name": self.names[ident],
+            "email": self.emails[ident],
+            "proba": proba,
+            "match": bool(proba >= self.threshold),
+        }
+
+    def resolve(self, name, email):
+        """
+        Best matching indexed identity for (name, email) as a dict with its
+        cluster_id, name, email, proba and whether proba reaches the
+        threshold; None if blocking finds no candidate. Identities already
+        in the index resolve to themselves with proba 1.0.
+        """
+        query = identity_record(name, email)
+        known = self.index._positions.get((query["name"], query["email"]))
+        if known is not None:
+            return self._result(known, 1.0)
+
+        candidates = list(dict.fromkeys(self.index.bucket_candidates(
+            identity_components(query, self.index.ignore_common_domains), self.max_bucket)))
+        if not candidates:
+            return None
+
+        X = query_pair_features(self.ident, self.vocabulary, query, candidates)
+        z = X @ self.coef + self.intercept
+        best = int(np.argmax(z))
+        return self._result(candidates[best], 1 / (1 + math.exp(-float(z[best]))))
+
+
+def _handler(resolver):
+    class ResolveHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/resolve":
+                self.send_error(404)
+                return
+            params = parse_qs(url.query)
+            result = resolver.resolve(params.get("name", [""])[0], params.get("email", [""])[0])
+            body = json.dumps(result).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ResolveHandler
+
+
+def make_server(resolver, host="127.0.0.1", port=8000):
+    """Local HTTP stand-in: GET /resolve?name=...&email=... returns JSON."""
+    return ThreadingHTTPServer((host, port), _handler(resolver))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve developer identities against the index")
+    parser.add_argument("--index", default="dedup_index.pkl")
+    parser.add_argument("--model", default="logreg.pkl")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="Serve GET /resolve on this port instead of reading stdin")
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args(argv)
+
+    resolver = Resolver.load(args.index, args.model, threshold=args.threshold)
+    if args.serve is not None:
+        server = make_server(resolver, args.host, args.serve)
+        print(f"serving on http://{args.host}:{args.serve}/resolve")
+        server.serve_forever()
+        return
+
+    # one "name,email" per line; the email is everything after the last comma
+    for line in sys.stdin:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        name, _, email = line.rpartition(",")
+        print(json.dumps(resolver.resolve(name, email)))
+
+
+if __name__ == "__main__":
+    main()
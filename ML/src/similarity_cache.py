@@ -0,0 +1,62 @@
+from functools import lru_cache
+import jellyfish
+from Levenshtein import ratio
+from rapidfuzz.distance import JaroWinkler
+
+# Entries per kernel; each entry is a pair of short strings and a float
+CACHE_SIZE = 1 << 18
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _jaro_winkler(a, b):
+    return float(JaroWinkler.normalized_similarity(a, b))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _levenshtein_ratio(a, b):
+    return ratio(a, b)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def phonetic_codes(s):
+    """(soundex, metaphone) of one string."""
+    return jellyfish.soundex(s), jellyfish.metaphone(s)
+
+
+# Both similarities are symmetric, so the pair is stored in sorted order and
+# (a, b) and (b, a) share one cache entry
+
+def jaro_winkler(a, b):
+    """Cached JaroWinkler.normalized_similarity of two strings."""
+    return _jaro_winkler(a, b) if a <= b else _jaro_winkler(b, a)
+
+
+def levenshtein_ratio(a, b):
+    """Cached Levenshtein.ratio of two strings."""
+    return _levenshtein_ratio(a, b) if a <= b else _levenshtein_ratio(b, a)
+
+
+_CACHES = {
+    "jaro_winkler": _jaro_winkler,
+    "levenshtein_ratio": _levenshtein_ratio,
+    "phonetic_codes": phonetic_codes,
+}
+
+
+def cache_stats():
+    """Hits, misses, current size and bound of every similarity cache."""
+    stats = {}
+    for name, fn in _CACHES.items():
+        info = fn.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    return stats
+
+
+def clear_caches():
+    for fn in _CACHES.values():
+        fn.cache_clear()
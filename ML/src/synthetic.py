@@ -0,0 +1,159 @@
+import random
+import pandas as pd
+
+FIRST_NAMES = [
+    "james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda",
+    "david", "elizabeth", "william", "barbara", "richard", "susan", "joseph", "jessica",
+    "thomas", "sarah", "charles", "karen", "wei", "li", "yuki", "hiroshi", "priya",
+    "rahul", "olga", "ivan", "fatima", "ahmed", "lucas", "sofia", "mateo", "camila",
+    "jürgen", "zoë", "josé", "andré", "françois", "søren", "łukasz", "ana", "chris",
+    "alex", "sam", "kim", "lee", "max", "nina", "omar",
+]
+
+LAST_NAMES = [
+    "smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis",
+    "rodriguez", "martinez", "hernandez", "lopez", "gonzalez", "wilson", "anderson",
+    "thomas", "taylor", "moore", "jackson", "martin", "wang", "zhang", "chen", "liu",
+    "tanaka", "suzuki", "patel", "sharma", "ivanov", "petrov", "müller", "schröder",
+    "núñez", "peña", "dvořák", "kowalski", "nguyen", "kim", "park", "cohen", "knight",
+    "o'brien", "van der berg", "de la cruz", "silva", "santos", "costa", "rossi",
+    "ferrari", "novak",
+]
+
+DOMAINS = [
+    "gmail.com", "outlook.com", "yahoo.com", "proton.me", "example.com", "corp.example.com",
+    "acme.io", "dev.example.org", "university.edu", "company.net",
+]
+
+BOTS = [
+    "dependabot[bot]", "github-actions[bot]", "renovate[bot]", "codecov[bot]",
+    "pre-commit-ci[bot]", "snyk-bot", "greenkeeper[bot]", "allcontributors[bot]",
+]
+
+_ASCII = str.maketrans({
+    "ü": "u", "ö": "o", "ë": "e", "é": "e", "ç": "c", "ø": "o", "ł": "l", "ñ": "n",
+    "ú": "u", "ř": "r", "á": "a", "'": "",
+})
+
+
+def _ascii(s):
+    return s.translate(_ASCII)
+
+
+def _typo(rng, s):
+    # one random edit: swap, drop, double or replace a letter
+    if len(s) < 3:
+        return s
+    k = rng.randrange(1, len(s) - 1)
+    op = rng.randrange(4)
+    if op == 0:
+        return s[:k - 1] + s[k] + s[k - 1] + s[k + 1:]
+    if op == 1:
+        return s[:k] + s[k + 1:]
+    if op == 2:
+        return s[:k] + s[k] + s[k:]
+    return s[:k] + rng.choice("aeioustnr") + s[k + 1:]
+
+
+def _title(s):
+    return " ".join(p[:1].upper() + p[1:] for p in s.split())
+
+
+def _local(rng, first, last):
+    first, last = _ascii(first).replace(" ", ""), _ascii(last).replace(" ", "")
+    style = rng.randrange(6)
+    if style == 0:
+        return f"{first}.{last}"
+    if style == 1:
+        return f"{first[0]}{last}"
+    if style == 2:
+        return f"{first}{last[0]}"
+    if style == 3:
+        return f"{last}.{first}"
+    if style == 4:
+        return f"{first}{rng.randrange(10, 2000)}"
+    return f"{first}_{last}"
+
+
+def _variant(rng, person, kind):
+    first, last, local, domain, handle, uid = person
+    name = _title(f"{first} {last}")
+    if kind == "base":
+        return name, f"{local}@{domain}"
+    if kind == "gmail_alias":
+        # dots and +tags are ignored by gmail, so these are the same mailbox
+        dotted = ".".join(local.replace(".", "")) if len(local) < 8 else local.replace(".", "")
+        return name, f"{dotted}+{rng.choice(['git', 'dev', 'oss', 'spam'])}@gmail.com"
+    if kind == "noreply":
+        return name, f"{uid}+{handle}@users.noreply.github.com"
+    if kind == "ascii":
+        return _title(_ascii(f"{first} {last}")), f"{local}@{domain}"
+    if kind == "swapped":
+        return _title(f"{last} {first}"), f"{local}@{rng.choice(DOMAINS)}"
+    if kind == "typo":
+        return _title(f"{_typo(rng, first)} {last}"), f"{_typo(rng, local)}@{domain}"
+    if kind == "initial":
+        return _title(f"{first[0]}. {last}"), f"{local}@{rng.choice(DOMAINS)}"
+    if kind == "handle":
+        return handle, f"{handle}@{rng.choice(DOMAINS)}"
+    raise ValueError(f"Unknown variant: {kind}")
+
+
+VARIANTS = ["gmail_alias", "noreply", "ascii", "swapped", "typo", "initial", "handle"]
+
+
+def generate_identities(n, seed=0, bot_share=0.01, max_aliases=4):
+    """
+    Deterministic synthetic developer identities for tests and benchmarks.
+
+    Returns a frame of exactly `n` rows with name, email and person_id (the
+    ground truth: rows of one person are the same developer). Every person
+    gets a base identity plus up to `max_aliases - 1` variants: gmail dot
+    and +tag aliases, GitHub noreply addresses, ASCII-folded diacritics,
+    swapped name order, typos, initials and bare handles. About `bot_share`
+    of the people are bots with several addresses. Duplicate (name, email)
+    rows are not produced.
+    """
+    rng = random.Random(seed)
+    rows = []
+    seen = set()
+    person_id = 0
+    while len(rows) < n:
+        if rng.random() < bot_share:
+            bot = rng.choice(BOTS)
+            emails = [f"{rng.randrange(10 ** 6, 10 ** 8)}+{bot}@users.noreply.github.com",
+                      f"bot-{person_id}@{rng.choice(DOMAINS)}"]
+            identities = [(bot, e) for e in emails]
+        else:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            local = _local(rng, first, last)
+            domain = rng.choice(DOMAINS)
+            handle = f"{_ascii(first)[:rng.randrange(1, 6)]}{_ascii(last).replace(' ', '')}"
+            if rng.random() < 0.3:
+                handle += str(rng.randrange(1, 100))
+            person = (first, last, local, domain, handle, rng.randrange(10 ** 6, 10 ** 8))
+            k = rng.randrange(max_aliases)
+            identities = [_variant(rng, person, "base")]
+            identities += [_variant(rng, person, v) for v in rng.sample(VARIANTS, k)]
+
+        for name, email in identities:
+            if len(rows) == n:
+                break
+            if (name, email) in seen:
+                continue
+            seen.add((name, email))
+            rows.append((name, email, person_id))
+        person_id += 1
+
+    return pd.DataFrame(rows, columns=["name", "email", "person_id"])
+
+
+def true_pairs(identities):
+    """Set of (i, j) row pairs, i < j, that belong to the same person."""
+    pairs = set()
+    for rows in identities.groupby("person_id").indices.values():
+        rows = sorted(rows.tolist())
+        for a in range(len(rows)):
+            for b in range(a + 1, len(rows)):
+                pairs.add((rows[a], rows[b]))
+    return pairs
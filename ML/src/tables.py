@@ -0,0 +1,182 @@
+import csv
+import pandas as pd
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+# Bird similarity columns: ratios fit in float32, the c4-c7 checks are booleans
+FLOAT32_COLUMNS = ("c1", "c2", "c3.1", "c3.2")
+BOOL_COLUMNS = ("c4", "c5", "c6", "c7")
+
+
+def _pyarrow():
+    # pyarrow is only needed for Parquet paths
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading or writing Parquet tables requires pyarrow") from e
+    return pa, pq
+
+
+def is_parquet(path):
+    return str(path).lower().endswith(PARQUET_SUFFIXES)
+
+
+def _arrow_type(pa, column, values=None):
+    if column in FLOAT32_COLUMNS:
+        return pa.float32()
+    if column in BOOL_COLUMNS:
+        return pa.bool_()
+    if values is None or values.dtype == object or pd.api.types.is_string_dtype(values):
+        return pa.string()
+    return pa.from_numpy_dtype(values.dtype)
+
+
+def _schema(pa, df):
+    return pa.schema([(c, _arrow_type(pa, c, df[c] if c in df else None)) for c in df.columns])
+
+
+def _to_arrow(pa, df, schema):
+    arrays = []
+    for field in schema:
+        values = df[field.name]
+        if pa.types.is_string(field.type):
+            values = values.astype(object).where(values.notna(), None)
+            values = [None if v is None else str(v) for v in values]
+        elif pa.types.is_boolean(field.type):
+            values = [None if v is None or v != v else _as_bool(v) for v in values]
+        arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "t", "yes")
+    return bool(value)
+
+
+def _from_arrow(pa, table):
+    # plain object strings, like pd.read_csv gives, so callers see the same frame
+    df = table.to_pandas()
+    for field in table.schema:
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            df[field.name] = df[field.name].astype(object)
+    return df
+
+
+def write_table(df, path, row_group_size=None):
+    """
+    Write a frame as Parquet (by file suffix) or CSV.
+
+    Parquet files are typed: string columns are dictionary-encoded, the Bird
+    ratio columns (FLOAT32_COLUMNS) are float32 and the c4-c7 checks real
+    booleans; other numeric columns keep their dtype.
+    """
+    if not is_parquet(path):
+        df.to_csv(path, index=False)
+        return
+    pa, pq = _pyarrow()
+    schema = _schema(pa, df)
+    pq.write_table(_to_arrow(pa, df, schema), path, row_group_size=row_group_size,
+                   use_dictionary=True, compression="zstd")
+
+
+def read_table(path, columns=None):
+    """Read a Parquet or CSV table, optionally only the given columns."""
+    if not is_parquet(path):
+        return pd.read_csv(path, usecols=columns)
+    pa, pq = _pyarrow()
+    return _from_arrow(pa, pq.read_table(path, columns=columns))
+
+
+def read_columns(path):
+    """Column names of a table without reading its rows."""
+    if not is_parquet(path):
+        return list(pd.read_csv(path, nrows=0).columns)
+    _, pq = _pyarrow()
+    return list(pq.ParquetFile(path).schema_arrow.names)
+
+
+def iter_table(path, batch_size=100_000, columns=None):
+    """Frames of at most `batch_size` rows; Parquet is read row group by row group."""
+    if not is_parquet(path):
+        yield from pd.read_csv(path, usecols=columns, chunksize=int(batch_size))
+        return
+    pa, pq = _pyarrow()
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=int(batch_size), columns=columns):
+        yield _from_arrow(pa, pa.Table.from_batches([batch]))
+
+
+class TableWriter:
+    """
+    Incremental writer for a Parquet or CSV table with fixed columns.
+
+    Rows (write_rows) or frames (write_frame) are appended as they come; for
+    Parquet each `batch_size` buffered rows become one row group. The header
+    (or schema) is written even if no rows are.
+    """
+
+    def __init__(self, path, columns, batch_size=100_000):
+        self.path = path
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.parquet = is_parquet(path)
+        self.rows = 0
+        self._buffer = []
+        self._writer = None
+        self._schema = None
+        if self.parquet:
+            self._pa, self._pq = _pyarrow()
+            self._file = None
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._file, lineterminator="\n")
+            self._csv.writerow(self.columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.rows += 1
+            if not self.parquet:
+                self._csv.writerow(row)
+                continue
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def write_frame(self, df):
+        df = df[self.columns]
+        self.rows += len(df)
+        if not self.parquet:
+            df.to_csv(self._file, index=False, header=False, lineterminator="\n")
+            return
+        self._flush()
+        self._write_arrow(df)
+
+    def _flush(self):
+        if self._buffer:
+            self._write_arrow(pd.DataFrame(self._buffer, columns=self.columns))
+            self._buffer = []
+
+    def _write_arrow(self, df):
+        if self._writer is None:
+            # the first batch fixes the schema of the file
+            self._schema = _schema(self._pa, df)
+            self._writer = self._pq.ParquetWriter(self.path, self._schema,
+                                                  use_dictionary=True, compression="zstd")
+        self._writer.write_table(_to_arrow(self._pa, df, self._schema))
+
+    def close(self):
+        if self.parquet:
+            self._flush()
+            if self._writer is None:
+                empty = pd.DataFrame({c: pd.Series(dtype=object) for c in self.columns})
+                self._writer = self._pq.ParquetWriter(self.path, _schema(self._pa, empty))
+            self._writer.close()
+        elif not self._file.closed:
+            self._file.close()
@@ -0,0 +1,34 @@
+import json
+
+from ML.benchmarks import run_benchmarks
+
+
+def _args(tmp_path, *extra):
+    return ["--sizes", "200", "--stages", "merge_candidates", "--no-memory", "--repeat", "1",
+            "--baseline", str(tmp_path / "baseline.json"), *extra]
+
+
+def test_missing_baseline_is_an_error(tmp_path):
+    assert run_benchmarks.main(_args(tmp_path)) == 2
+
+
+def test_baseline_round_trip_and_count_regression(tmp_path):
+    assert run_benchmarks.main(_args(tmp_path, "--update-baseline")) == 0
+    baseline = json.loads((tmp_path / "baseline.json").read_text())
+    stats = baseline["results"]["200"]["merge_candidates"]
+    assert stats["candidates"] > 0
+
+    # throughput is machine dependent, counts are not
+    stats["wall_s"] = 5.0
+    report = {"results": {"200": {"merge_candidates": dict(stats, items_per_s=0)}}}
+    problems, warnings = run_benchmarks.compare(report, baseline)
+    assert problems == [] and any("throughput" in w for w in warnings)
+    report["results"]["200"]["merge_candidates"]["candidates"] += 1
+    problems, _ = run_benchmarks.compare(report, baseline)
+    assert any("candidates" in p for p in problems)
+
+
+def test_short_stages_skip_the_throughput_check():
+    baseline = {"results": {"200": {"merge_candidates": {"wall_s": 0.3, "items_per_s": 1000.0}}}}
+    report = {"results": {"200": {"merge_candidates": {"wall_s": 0.6, "items_per_s": 500.0}}}}
+    assert run_benchmarks.compare(report, baseline) == ([], [])
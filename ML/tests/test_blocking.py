@@ -1,8 +1,20 @@
+import numpy as np
+import pytest
+
 from ML.src.blocking import (
     parse_gh_handle,
     bucket_key,
+    candidate_frame,
     make_candidates,
     merge_candidates,
+    merge_candidate_index,
+    merge_candidate_pairs,
+    minhash_candidates,
+    minhash_signatures,
+    qgram_candidates,
+    qgram_identity_pairs,
+    record_table,
+    sorted_neighbourhood_candidates,
     COMMON_DOMAINS,
 )
 
@@ -82,6 +94,60 @@ def test_make_candidates_bucket_limit():
     assert pairs == []
 
 
+def test_make_candidates_splits_oversized_bucket():
+    records = [
+        {"name": "Alice Smith", "email": "alice@example.com"},
+        {"name": "Alan Smith", "email": "alan@example.com"},
+        {"name": "Bob Jones", "email": "bob@example.com"},
+        {"name": "Carl Young", "email": "carl@example.com"},
+    ]
+    report = {}
+    pairs = list(make_candidates(records, key=("domain",), max_bucket=2, report=report))
+    assert [(a["email"], b["email"]) for a, b in pairs] == [("alice@example.com", "alan@example.com")]
+    assert report["pairs"] == 1
+    assert report["split_buckets"] == 1
+    assert report["dropped_buckets"] == 0
+
+
+def test_make_candidates_no_split_drops_bucket():
+    records = [
+        {"name": "Alice Smith", "email": "alice@example.com"},
+        {"name": "Alan Smith", "email": "alan@example.com"},
+        {"name": "Bob Jones", "email": "bob@example.com"},
+    ]
+    report = {}
+    pairs = list(make_candidates(records, key=("domain",), max_bucket=2,
+                                 split_oversized=False, report=report))
+    assert pairs == []
+    assert report["dropped_buckets"] == 1
+    assert report["dropped_pairs"] == 3
+
+
+def test_make_candidates_skips_empty_keys():
+    # no identity has a GitHub handle, so the gh_handle pass has no buckets
+    records = [{"name": f"User {i}", "email": f"user{i}@example{i}.com"} for i in range(5)]
+    report = {}
+    pairs = list(make_candidates(records, key=("gh_handle",), max_bucket=2, report=report))
+    assert pairs == []
+    assert report["split_buckets"] == 0
+    assert report["dropped_buckets"] == 0
+
+
+def test_merge_candidates_report_no_empty_gh_handle_pairs():
+    records = [
+        {"name": "Alice Smith", "email": "alice@acme.io"},
+        {"name": "Bob Jones", "email": "bob@corp.org"},
+        {"name": "Carl Young", "email": "carl@firm.net"},
+        {"name": "Alice Smith", "email": "1+asmith@users.noreply.github.com"},
+        {"name": "A. Smith", "email": "2+asmith@users.noreply.github.com"},
+    ]
+    report = {}
+    pairs = list(merge_candidates(records, report=report))
+    assert report["gh_handle"]["pairs"] == 1
+    assert ("1+asmith@users.noreply.github.com", "2+asmith@users.noreply.github.com") in \
+        [(a["email"], b["email"]) for a, b in pairs]
+
+
 def test_make_candidates_skip_single():
     records = [{"name": "Solo", "email": "solo@example.com"}]
     pairs = list(make_candidates(records))
@@ -110,6 +176,210 @@ def test_merge_candidates_bucket_limit():
     assert pairs == []
 
 
+def test_merge_candidates_report():
+    records = [
+        {"name": "Alice Smith", "email": "alice@example.com"},
+        {"name": "Alice Smith", "email": "asmith@example.com"},
+    ]
+    report = {}
+    pairs = list(merge_candidates(records, lsh=True, report=report))
+    assert len(pairs) == 1
+    assert set(report) == {
+        "domain|lastname_initial", "gh_handle", "domain|prefix_initial",
+        "lastname_initial", "minhash",
+    }
+    assert report["domain|lastname_initial"]["new_pairs"] == 1
+    assert sum(r["new_pairs"] for r in report.values()) == 1
+    assert report["lastname_initial"]["pairs"] == 1
+
+
+def test_merge_candidate_index_expected_pairs():
+    records = [
+        {"name": "Alice Smith", "email": "alice@example.com"},
+        {"name": "Alice S", "email": "ALICE@example.com"},
+        {"name": "Alan Smith", "email": "alan@example.com"},
+        {"name": "Bob Stone", "email": "bob@example.com"},
+        {"name": "Carol Stone", "email": "cstone@other.org"},
+        {"name": "Alan Smith", "email": "7+asmith@users.noreply.github.com"},
+    ]
+    left, right = merge_candidate_index(records)
+    assert left.dtype == np.int32 and right.dtype == np.int32
+    # pass order, first occurrence of each lowercased email pair kept:
+    # (1, 2) and (1, 3) repeat the email pairs of (0, 2) and (0, 3)
+    assert list(zip(left.tolist(), right.tolist())) == [
+        (0, 1), (0, 2), (0, 3), (2, 3),
+        (0, 4), (0, 5), (2, 4), (2, 5), (3, 4), (3, 5), (4, 5),
+    ]
+    pairs = [(id(a), id(b)) for a, b in merge_candidates(records)]
+    assert pairs == [(id(records[i]), id(records[j])) for i, j in zip(left, right)]
+
+
+def test_merge_candidate_pairs_identity_ids():
+    records = [
+        {"name": "Alice Smith", "email": "alice@example.com"},
+        {"name": "Alice Smith", "email": "asmith@example.com"},
+        {"name": "Alice Smith", "email": "alice@example.com"},
+    ]
+    table, left, right = merge_candidate_pairs(records)
+    assert len(table) == 2
+    frame = candidate_frame(table, left, right)
+    assert list(frame.columns) == ["name_1", "email_1", "name_2", "email_2"]
+    assert frame.iloc[0].tolist() == ["Alice Smith", "alice@example.com",
+                                      "Alice Smith", "asmith@example.com"]
+
+
+def test_merge_candidate_index_empty_input():
+    left, right = merge_candidate_index([])
+    assert len(left) == 0 and len(right) == 0
+
+
 def test_merge_candidates_empty_input():
     pairs = list(merge_candidates([]))
     assert pairs == []
+
+
+# ------------------------------------------------
+# minhash_candidates
+# ------------------------------------------------
+
+def test_minhash_signatures_deterministic():
+    records = [{"name": "Alice Smith", "email": "asmith@example.com"},
+               {"name": "", "email": ""}]
+    table, _ = record_table(records)
+    sig1, has1 = minhash_signatures(table, num_perm=8, seed=3)
+    sig2, has2 = minhash_signatures(table, num_perm=8, seed=3)
+    assert sig1.shape == (2, 8)
+    assert (sig1 == sig2).all()
+    assert list(has1) == [True, False]
+
+
+def test_minhash_candidates_catches_typos_and_reordering():
+    records = [
+        {"name": "Jonathan Smith", "email": "jon@corp-a.com"},
+        {"name": "Smith Jonathan", "email": "jsmith@corp-b.org"},
+        {"name": "Jonathon Smith", "email": "jonathan.smith@gmail.com"},
+        {"name": "Zed Quorra", "email": "zq@elsewhere.net"},
+    ]
+    pairs = list(minhash_candidates(records, bands=20, rows=2))
+    emails = {frozenset((a["email"], b["email"])) for a, b in pairs}
+    assert frozenset(("jon@corp-a.com", "jsmith@corp-b.org")) in emails
+    assert frozenset(("jon@corp-a.com", "jonathan.smith@gmail.com")) in emails
+    assert not any("zq@elsewhere.net" in e for e in emails)
+
+
+def test_minhash_candidates_empty_input():
+    assert list(minhash_candidates([])) == []
+
+
+def test_merge_candidates_with_lsh_adds_pairs():
+    records = [
+        {"name": "Jonathan Smith", "email": "1+jon@users.noreply.github.com"},
+        {"name": "Smith Jonathan", "email": "2+smithj@users.noreply.github.com"},
+    ]
+    assert list(merge_candidates(records)) == []
+    pairs = list(merge_candidates(records, lsh={"bands": 20, "rows": 2}))
+    assert len(pairs) == 1
+
+
+# ------------------------------------------------
+# sorted_neighbourhood_candidates
+# ------------------------------------------------
+
+def test_sorted_neighbourhood_pairs_adjacent_names():
+    records = [
+        {"name": "Zoe Adams", "email": "z@a.com"},
+        {"name": "Alice Smith", "email": "a1@b.com"},
+        {"name": "Alice Smyth", "email": "a2@c.com"},
+        {"name": "Mike Jones", "email": "m@d.com"},
+    ]
+    pairs = list(sorted_neighbourhood_candidates(records, keys=("name",), window=2))
+    emails = {frozenset((a["email"], b["email"])) for a, b in pairs}
+    assert frozenset(("a1@b.com", "a2@c.com")) in emails
+    assert len(pairs) == 3
+
+
+def test_sorted_neighbourhood_bounded_pair_count():
+    records = [{"name": f"User {i}", "email": f"user{i}@example.com"} for i in range(50)]
+    pairs = list(sorted_neighbourhood_candidates(records, keys=("name", "local"), window=4))
+    assert len(pairs) <= 2 * 3 * 50
+    assert len({(id(a), id(b)) for a, b in pairs}) == len(pairs)
+
+
+def test_sorted_neighbourhood_skips_empty_keys():
+    records = [{"name": "A", "email": "a@x.com"}, {"name": "B", "email": "b@x.com"}]
+    assert list(sorted_neighbourhood_candidates(records, keys=("gh_handle",))) == []
+
+
+def test_sorted_neighbourhood_unknown_key():
+    with pytest.raises(ValueError):
+        list(sorted_neighbourhood_candidates([{"name": "A", "email": "a@x.com"}], keys=("bogus",)))
+
+
+def test_merge_candidates_with_neighbourhood():
+    records = [
+        {"name": "Jonathan Smith", "email": "1+jon@users.noreply.github.com"},
+        {"name": "Jonathan Tsmith", "email": "2+smithj@users.noreply.github.com"},
+    ]
+    assert list(merge_candidates(records)) == []
+    pairs = list(merge_candidates(records, neighbourhood={"keys": ("name",), "window": 2}))
+    assert len(pairs) == 1
+
+
+# ------------------------------------------------
+# qgram_candidates
+# ------------------------------------------------
+
+def test_qgram_identity_pairs_matches_brute_force():
+    import itertools
+    import random
+    rng = random.Random(0)
+    for threshold in (0.3, 0.5, 0.8, 1.0):
+        sets = [set(rng.sample("abcdefgh", rng.randint(0, 5))) for _ in range(30)]
+        expected = sorted(
+            (i, j) for i, j in itertools.combinations(range(len(sets)), 2)
+            if sets[i] and sets[j] and len(sets[i] & sets[j]) / len(sets[i] | sets[j]) >= threshold
+        )
+        assert sorted(qgram_identity_pairs(sets, threshold)) == expected
+
+
+def test_qgram_candidates_finds_similar_records():
+    records = [
+        {"name": "Jonathan Smith", "email": "jsmith@a.com"},
+        {"name": "Jonathan Smyth", "email": "jsmyth@b.com"},
+        {"name": "Maria Garcia", "email": "maria@c.com"},
+    ]
+    pairs = list(qgram_candidates(records, threshold=0.5))
+    assert [(a["email"], b["email"]) for a, b in pairs] == [("jsmith@a.com", "jsmyth@b.com")]
+
+
+def test_qgram_candidates_duplicate_records():
+    records = [{"name": "Ann Lee", "email": "ann@x.com"}] * 2
+    assert len(list(qgram_candidates(records, threshold=0.9))) == 1
+
+
+def test_merge_candidates_with_qgram():
+    records = [
+        {"name": "Jonathan Smith", "email": "1+jon@users.noreply.github.com"},
+        {"name": "Jonathan Tsmith", "email": "2+smithj@users.noreply.github.com"},
+    ]
+    report = {}
+    pairs = list(merge_candidates(records, qgram={"threshold": 0.4}, report=report))
+    assert len(pairs) == 1
+    assert report["qgram"]["new_pairs"] == 1
+
+
+# ------------------------------------------------
+# phonetic pass
+# ------------------------------------------------
+
+def test_merge_candidates_with_phonetic_pass():
+    records = [
+        {"name": "Chris Knight", "email": "1+kn@users.noreply.github.com"},
+        {"name": "Chris Night", "email": "2+night@users.noreply.github.com"},
+        {"name": "Chris", "email": "3+chris@users.noreply.github.com"},
+    ]
+    assert list(merge_candidates(records)) == []
+    report = {}
+    pairs = list(merge_candidates(records, phonetic=True, report=report))
+    assert [(a["name"], b["name"]) for a, b in pairs] == [("Chris Knight", "Chris Night")]
+    assert report["metaphone_last|first_initial"]["new_pairs"] == 1
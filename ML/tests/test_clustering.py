@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from ML.src.clustering import (
+    UnionFind,
+    connected_components,
+    correlation_split,
+    cluster_pairs,
+    cluster_scored_csv,
+)
+from ML.src.tables import read_table, write_table
+
+
+def _scored(rows):
+    return pd.DataFrame(rows, columns=["name_1", "email_1", "name_2", "email_2", "proba"])
+
+
+# ------------------------------------------------
+# UnionFind / connected_components
+# ------------------------------------------------
+
+def test_union_find_basic():
+    uf = UnionFind(5)
+    assert uf.union(0, 1)
+    assert uf.union(3, 4)
+    assert not uf.union(1, 0)
+    assert uf.find(0) == uf.find(1)
+    assert uf.find(2) != uf.find(0)
+    assert uf.labels().tolist() == [0, 0, 1, 2, 2]
+
+
+def test_union_find_max_size():
+    uf = UnionFind(3)
+    assert uf.union(0, 1, max_size=2)
+    assert not uf.union(1, 2, max_size=2)
+
+
+def test_connected_components_chain():
+    labels = connected_components(6, [0, 1, 4], [1, 2, 5])
+    assert labels.tolist() == [0, 0, 0, 1, 2, 2]
+
+
+def test_connected_components_max_size_keeps_strongest_edges():
+    labels = connected_components(3, [0, 1], [1, 2], scores=[0.6, 0.9], max_cluster_size=2)
+    assert labels.tolist() == [0, 1, 1]
+
+
+# ------------------------------------------------
+# correlation_split
+# ------------------------------------------------
+
+def test_correlation_split_breaks_weak_chain():
+    groups = correlation_split([0, 1, 2], {(0, 1): 0.1, (1, 2): 0.05, (0, 2): -0.8})
+    assert sorted(sorted(g) for g in groups) == [[0, 1], [2]]
+
+
+def test_correlation_split_keeps_consistent_cluster():
+    groups = correlation_split([0, 1, 2], {(0, 1): 0.1, (1, 2): 0.1, (0, 2): 0.1})
+    assert sorted(groups[0]) == [0, 1, 2]
+
+
+# ------------------------------------------------
+# cluster_pairs
+# ------------------------------------------------
+
+def test_cluster_pairs_transitive_merge():
+    df = _scored([
+        ("Ann Lee", "ann@x.com", "A Lee", "alee@x.com", 0.95),
+        ("A Lee", "alee@x.com", "Ann L", "annl@y.com", 0.93),
+        ("Bob Ray", "bob@x.com", "Ann Lee", "ann@x.com", 0.10),
+    ])
+    assignments, stats = cluster_pairs(df, threshold=0.9)
+    by_email = assignments.set_index("email")
+    assert by_email.loc["ann@x.com", "cluster_id"] == by_email.loc["annl@y.com", "cluster_id"]
+    assert by_email.loc["bob@x.com", "cluster_size"] == 1
+    assert by_email.loc["annl@y.com", "canonical_email"] == "alee@x.com"
+    assert sorted(stats["size"].tolist()) == [1, 3]
+    assert stats["edges"].sum() == 2
+
+
+def test_cluster_pairs_splits_low_internal_score():
+    df = _scored([
+        ("A", "a@x.com", "B", "b@x.com", 0.95),
+        ("B", "b@x.com", "C", "c@x.com", 0.92),
+        ("A", "a@x.com", "C", "c@x.com", 0.01),
+    ])
+    assignments, _ = cluster_pairs(df, threshold=0.9)
+    assert assignments["cluster_id"].nunique() == 1
+    assignments, _ = cluster_pairs(df, threshold=0.9, min_internal_score=0.8)
+    labels = assignments.set_index("email")["cluster_id"]
+    assert labels["a@x.com"] == labels["b@x.com"]
+    assert labels["c@x.com"] != labels["a@x.com"]
+
+
+def test_cluster_pairs_empty():
+    assignments, stats = cluster_pairs(_scored([]), threshold=0.9)
+    assert len(assignments) == 0
+    assert len(stats) == 0
+
+
+def test_cluster_scored_csv(tmp_path):
+    scored = tmp_path / "scored.csv"
+    _scored([("A", "a@x.com", "B", "b@x.com", 0.95)]).to_csv(scored, index=False)
+    out = tmp_path / "clusters.csv"
+    stats = tmp_path / "stats.csv"
+    cluster_scored_csv(scored, out, stats, threshold=0.9)
+    assert np.array_equal(pd.read_csv(out)["cluster_id"], [0, 0])
+    assert pd.read_csv(stats)["size"].tolist() == [2]
+
+
+def test_cluster_scored_parquet(tmp_path):
+    scored = tmp_path / "scored.parquet"
+    write_table(_scored([("A", "a@x.com", "B", "b@x.com", 0.95)]), scored)
+    out = tmp_path / "clusters.parquet"
+    cluster_scored_csv(scored, out, threshold=0.9)
+    assert read_table(out)["cluster_id"].tolist() == [0, 0]
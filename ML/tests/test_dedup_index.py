@@ -0,0 +1,126 @@
+import joblib
+import numpy as np
+import pandas as pd
+
+from ML.src.dedup_index import DedupIndex, update_index
+from ML.src.tables import read_table, write_table
+
+
+class NameModel:
+    """Stand-in model: proba is the name Jaro-Winkler column."""
+
+    def predict_proba(self, X):
+        p = np.asarray(X)[:, 0]
+        return np.column_stack([1 - p, p])
+
+
+# ------------------------------------------------
+# DedupIndex
+# ------------------------------------------------
+
+def test_add_scores_only_new_pairs():
+    index = DedupIndex(threshold=0.9)
+    first = index.add(["Alice Smith", "Bob Smith"], ["alice@example.com", "bob@example.com"],
+                      NameModel())
+    assert len(first) == 1
+    scored = index.add(["Alice Smith"], ["asmith@example.com"], NameModel())
+    emails = {(a, b) for a, b in zip(scored["email_1"], scored["email_2"])}
+    assert ("alice@example.com", "asmith@example.com") in emails
+    assert all("asmith@example.com" in pair for pair in emails)
+
+    clusters = index.clusters().set_index("email")["cluster_id"]
+    assert clusters["alice@example.com"] == clusters["asmith@example.com"]
+    assert clusters["bob@example.com"] != clusters["alice@example.com"]
+
+
+def test_add_ignores_known_identities():
+    index = DedupIndex()
+    index.add(["Alice Smith"], ["alice@example.com"], NameModel())
+    scored = index.add(["Alice Smith"], ["alice@example.com"], NameModel())
+    assert len(index) == 1
+    assert len(scored) == 0
+    assert list(scored.columns) == ["name_1", "email_1", "name_2", "email_2", "proba"]
+
+
+def test_add_clusters_seeds_index():
+    index = DedupIndex(threshold=0.9)
+    index.add_clusters(pd.DataFrame({
+        "name": ["Ann Lee", "A. Lee", "Bob Ray"],
+        "email": ["ann@x.com", "alee@y.com", "bob@x.com"],
+        "cluster_id": [0, 0, 1],
+    }))
+    assert index.clusters()["cluster_id"].tolist() == [0, 0, 1]
+
+
+def test_save_and_load(tmp_path):
+    index = DedupIndex(threshold=0.9)
+    index.add(["Alice Smith", "Alice Smith"], ["alice@example.com", "asmith@example.com"],
+              NameModel())
+    path = tmp_path / "index.pkl"
+    index.save(path)
+    loaded = DedupIndex.load(path)
+    assert loaded.clusters().equals(index.clusters())
+
+
+def test_update_index(tmp_path):
+    model = tmp_path / "model.pkl"
+    joblib.dump(NameModel(), model)
+    new = tmp_path / "new.csv"
+    pd.DataFrame({"name": ["Alice Smith", "Alice Smith"],
+                  "email": ["alice@example.com", "asmith@example.com"]}).to_csv(new, index=False)
+    out = tmp_path / "clusters.csv"
+    clusters = update_index(tmp_path / "index.pkl", new, model, out, threshold=0.9)
+    assert clusters["cluster_id"].tolist() == [0, 0]
+    assert pd.read_csv(out)["cluster_id"].tolist() == [0, 0]
+    assert len(DedupIndex.load(tmp_path / "index.pkl")) == 2
+
+
+def test_update_index_parquet(tmp_path):
+    model = tmp_path / "model.pkl"
+    joblib.dump(NameModel(), model)
+    new = tmp_path / "new.parquet"
+    write_table(pd.DataFrame({"name": ["Alice Smith", "Alice Smith"],
+                              "email": ["alice@example.com", "asmith@example.com"]}), new)
+    out = tmp_path / "clusters.parquet"
+    scored = tmp_path / "scored.parquet"
+    update_index(tmp_path / "index.pkl", new, model, out, scored_csv=scored, threshold=0.9)
+    assert read_table(out)["cluster_id"].tolist() == [0, 0]
+    assert len(read_table(scored)) == 1
+
+
+def test_update_index_seeds_unmatched_identities(tmp_path):
+    model = tmp_path / "model.pkl"
+    joblib.dump(NameModel(), model)
+    # Carl Young matched nobody, so the clustering output does not list him
+    pd.DataFrame({
+        "name_1": ["Ann Lee", "Ann Lee"], "email_1": ["ann@x.com", "ann@x.com"],
+        "name_2": ["Ann Lee", "Carl Young"], "email_2": ["alee@x.com", "carl@x.com"],
+    }).to_csv(tmp_path / "pairs.csv", index=False)
+    pd.DataFrame({"name": ["Ann Lee", "Ann Lee"], "email": ["ann@x.com", "alee@x.com"],
+                  "cluster_id": [0, 0]}).to_csv(tmp_path / "seed.csv", index=False)
+    pd.DataFrame({"name": ["Carl Young"], "email": ["cyoung@x.com"]}).to_csv(
+        tmp_path / "new.csv", index=False)
+
+    clusters = update_index(tmp_path / "index.pkl", tmp_path / "new.csv", model,
+                            tmp_path / "clusters.csv", threshold=0.9,
+                            seed_clusters_csv=tmp_path / "seed.csv",
+                            seed_devs_csv=tmp_path / "pairs.csv")
+    ids = clusters.set_index("email")["cluster_id"]
+    assert len(clusters) == 4
+    assert ids["ann@x.com"] == ids["alee@x.com"]
+    assert ids["carl@x.com"] == ids["cyoung@x.com"]
+    assert ids["carl@x.com"] != ids["ann@x.com"]
+
+
+def test_update_index_applies_threshold_to_loaded_index(tmp_path):
+    model = tmp_path / "model.pkl"
+    joblib.dump(NameModel(), model)
+    new = tmp_path / "new.csv"
+    pd.DataFrame({"name": ["Alice Smith"], "email": ["alice@example.com"]}).to_csv(new, index=False)
+    path = tmp_path / "index.pkl"
+    update_index(path, new, model, tmp_path / "clusters.csv", threshold=0.9)
+    assert DedupIndex.load(path).threshold == 0.9
+    update_index(path, new, model, tmp_path / "clusters.csv", threshold=0.99)
+    assert DedupIndex.load(path).threshold == 0.99
+    update_index(path, new, model, tmp_path / "clusters.csv")
+    assert DedupIndex.load(path).threshold == 0.99
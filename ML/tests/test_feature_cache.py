@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ML.src.feature_cache import FeatureCache, pair_keys
+from ML.src.features import build_features_batch
+from ML.src.identities import pair_identity_ids
+
+
+def _frame(n, offset=0):
+    return pd.DataFrame({
+        "name_1": [f"Dev Person{i}" for i in range(offset, offset + n)],
+        "email_1": [f"dev{i}@example.com" for i in range(offset, offset + n)],
+        "name_2": [f"Dev Persen{i % 9}" for i in range(offset, offset + n)],
+        "email_2": [f"person{i % 6}@example.org" for i in range(offset, offset + n)],
+    })
+
+
+# ------------------------------------------------
+# pair_keys
+# ------------------------------------------------
+
+def test_pair_keys_independent_of_table():
+    df = _frame(10)
+    table, left, right = pair_identity_ids(df)
+    sub_table, sub_left, sub_right = pair_identity_ids(df.iloc[3:6])
+    assert np.array_equal(pair_keys(table, left, right)[3:6],
+                          pair_keys(sub_table, sub_left, sub_right))
+
+
+def test_pair_keys_ordered():
+    df = _frame(3)
+    table, left, right = pair_identity_ids(df)
+    assert not np.array_equal(pair_keys(table, left, right), pair_keys(table, right, left))
+
+
+# ------------------------------------------------
+# FeatureCache
+# ------------------------------------------------
+
+def test_cache_matches_uncached_and_reuses_rows(tmp_path):
+    cache = FeatureCache(tmp_path)
+    first = _frame(20)
+    assert np.array_equal(cache.frame_features(first), build_features_batch(first))
+    assert cache.misses == 20 and cache.hits == 0
+
+    # overlapping frame: 10 rows seen before, 10 new
+    second = _frame(20, offset=10)
+    X = FeatureCache(tmp_path).frame_features(second)
+    assert np.array_equal(X, build_features_batch(second))
+
+    again = FeatureCache(tmp_path)
+    assert np.array_equal(again.frame_features(second), X)
+    assert again.hits == 20 and again.misses == 0
+
+
+def test_cache_duplicate_pairs(tmp_path):
+    df = pd.concat([_frame(5), _frame(5)], ignore_index=True)
+    cache = FeatureCache(tmp_path)
+    assert np.array_equal(cache.frame_features(df), build_features_batch(df))
+
+
+def test_cache_merges_segments(tmp_path):
+    cache = FeatureCache(tmp_path)
+    frames = [_frame(4, offset=4 * k) for k in range(FeatureCache.MERGE_FANOUT + 1)]
+    for df in frames:
+        cache.frame_features(df)
+    segments = cache._segments()
+    assert len(segments) < len(frames)
+    for _, keys, _ in segments:
+        assert np.all(keys[1:] > keys[:-1])
+
+    again = FeatureCache(tmp_path)
+    for df in frames:
+        assert np.array_equal(again.frame_features(df), build_features_batch(df))
+    assert again.misses == 0
+
+
+def test_cache_merge_copies_in_blocks(tmp_path):
+    cache = FeatureCache(tmp_path)
+    frames = [_frame(4, offset=4 * k) for k in range(2)]
+    for df in frames:
+        cache.frame_features(df)
+    cache._merge(cache._segments(), block=3)
+    assert len(cache._segments()) == 1
+    assert not [f for f in os.listdir(cache.path) if ".tmp" in f]
+
+    again = FeatureCache(tmp_path)
+    for df in frames:
+        assert np.array_equal(again.frame_features(df), build_features_batch(df))
+    assert again.misses == 0
@@ -1,14 +1,21 @@
 # tests/test_features.py
 import numpy as np
+import pandas as pd
 import pytest
 from ML.src.features import (
     jaro_winkler_sim,
     tfidf_similarity,
+    NameTfidf,
     phonetic_similarity,
     get_initials,
     prefix_contains_name,
     build_features,
+    build_features_batch,
+    pair_features,
+    identity_arrays,
+    query_pair_features,
 )
+from ML.src.identities import pair_identity_ids, build_identity_table, identity_record
 
 
 # ------------------------------------------------
@@ -51,6 +58,45 @@ def test_tfidf_similarity_handles_empty():
     assert tfidf_similarity("", "") >= 0.0
 
 
+def test_tfidf_similarity_matches_two_document_vectorizer():
+    """Should equal fitting a TfidfVectorizer on just the two strings."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    for a, b in [("alice smith", "alicia smith"), ("bob", "robert brown"), ("a", "")]:
+        X = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4)).fit_transform([a, b])
+        expected = cosine_similarity(X[0], X[1])[0, 0]
+        assert tfidf_similarity(a, b) == pytest.approx(expected, abs=1e-12)
+
+
+# ------------------------------------------------
+# Tests for NameTfidf
+# ------------------------------------------------
+
+def test_name_tfidf_pair_similarity_batch():
+    """Should score index pairs in one call, matching the single-pair API."""
+    names = ["alice smith", "alicia smith", "bob brown"]
+    model = NameTfidf().fit(names)
+    sims = model.pair_similarity([0, 0, 1], [0, 1, 2])
+    assert sims.shape == (3,)
+    assert sims[0] == pytest.approx(1.0)
+    assert sims[1] == pytest.approx(model.similarity("alice smith", "alicia smith"))
+    assert sims[2] == pytest.approx(0.0)
+
+
+def test_name_tfidf_unseen_names():
+    """Should project names outside the fitted corpus instead of failing."""
+    model = NameTfidf().fit(["alice smith", "bob brown"])
+    assert 0 < model.similarity("alice smith", "alice smyth") < 1
+
+
+def test_build_features_with_corpus_tfidf():
+    """Should take name_tfidf from the fitted corpus model when given."""
+    model = NameTfidf().fit(["alice smith", "alicia smith", "bob brown"])
+    features = build_features(("Alice Smith", "a@x.com"), ("Alicia Smith", "b@x.com"), tfidf=model)
+    assert features[1] == pytest.approx(model.similarity("alice smith", "alicia smith"))
+
+
 # ------------------------------------------------
 # Tests for phonetic_similarity
 # ------------------------------------------------
@@ -146,3 +192,85 @@ def test_build_features_same_person_high_similarity():
     assert features[8] == 1  # firstname_equal
     assert features[9] == 1  # lastname_equal
     assert features[10] == 1  # initials_equal
+
+
+# ------------------------------------------------
+# Tests for build_features_batch
+# ------------------------------------------------
+
+def test_build_features_batch_matches_scalar_path():
+    """Should return exactly the rows build_features gives pair by pair."""
+    df = pd.DataFrame([
+        {"name_1": "Alice Smith", "email_1": "alice.smith@example.com",
+         "name_2": "Alicia Smith", "email_2": "asmith@example.com"},
+        {"name_1": "Bob Brown", "email_1": "bob.brown@gmail.com",
+         "name_2": "Bob Brown", "email_2": "bobbrown+x@googlemail.com"},
+        {"name_1": "José María-López", "email_1": "123+jml@users.noreply.github.com",
+         "name_2": "Jose Lopez", "email_2": "jlopez@example.org"},
+        {"name_1": "", "email_1": "", "name_2": "Solo", "email_2": "invalid"},
+    ])
+    X = build_features_batch(df)
+    expected = np.vstack([
+        build_features((r.name_1, r.email_1), (r.name_2, r.email_2))
+        for r in df.itertuples()
+    ])
+    assert X.shape == (4, 15)
+    assert np.array_equal(X, expected)
+
+
+def test_build_features_batch_empty_frame():
+    """Should return an empty matrix with 15 columns."""
+    df = pd.DataFrame(columns=["name_1", "email_1", "name_2", "email_2"])
+    assert build_features_batch(df).shape == (0, 15)
+
+
+def test_pair_features_parallel_matches_serial():
+    """Should give the same rows, in the same order, with a process pool."""
+    df = pd.DataFrame({
+        "name_1": [f"Dev Person{i}" for i in range(40)],
+        "email_1": [f"dev{i}@example.com" for i in range(40)],
+        "name_2": [f"Dev Persen{i % 9}" for i in range(40)],
+        "email_2": [f"person{i % 6}@example.org" for i in range(40)],
+    })
+    table, left, right = pair_identity_ids(df)
+    serial = pair_features(table, left, right)
+    parallel = pair_features(table, left, right, n_jobs=2, chunk_size=7)
+    assert np.array_equal(serial, parallel)
+
+
+def test_pair_features_with_corpus_tfidf():
+    """Should match build_features(tfidf=) row by row, serially and in a pool."""
+    df = pd.DataFrame({
+        "name_1": ["Alice Smith", "Bob Brown", "", "Dev Person3"] * 5,
+        "email_1": ["a@x.com", "bob@x.com", "e@x.com", "dev3@x.com"] * 5,
+        "name_2": ["Alicia Smith", "Unseen Name", "", "Dev Persen"] * 5,
+        "email_2": ["b@x.com", "u@y.com", "f@x.com", "p@x.com"] * 5,
+    })
+    model = NameTfidf().fit(["alice smith", "alicia smith", "bob brown", "dev person3"])
+    expected = np.vstack([
+        build_features((r.name_1, r.email_1), (r.name_2, r.email_2), tfidf=model)
+        for r in df.itertuples()
+    ])
+    X = build_features_batch(df, tfidf=model)
+    assert np.allclose(X, expected, rtol=0, atol=1e-12)
+    table, left, right = pair_identity_ids(df)
+    assert np.array_equal(pair_features(table, left, right, tfidf=model, n_jobs=2, chunk_size=6), X)
+    assert not np.array_equal(X[:, 1], build_features_batch(df)[:, 1])
+
+
+def test_query_pair_features_matches_scalar_path():
+    """Should give build_features rows of a query against indexed identities."""
+    table = build_identity_table(
+        ["Alice Smith", "Alicia Smith", "", "José María-López", "Bob"],
+        ["alice.smith@example.com", "asmith@example.com", "x@example.com",
+         "123+jml@users.noreply.github.com", ""],
+    )
+    ident, vocabulary = identity_arrays(table)
+    for name, email in [("Alice Smyth", "alice@example.com"), ("", "blank@example.com"),
+                        ("Zzyzx Qwerty", "zq@example.org")]:
+        rows = [4, 0, 2, 3, 1]
+        X = query_pair_features(ident, vocabulary, identity_record(name, email), rows)
+        expected = np.vstack([
+            build_features((name, email), (table["name"][r], table["email"][r])) for r in rows
+        ])
+        assert np.array_equal(X, expected)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ML.src.identities import (
+    IDENTITY_COLUMNS,
+    build_identity_table,
+    identity_ids,
+    pair_identity_ids,
+)
+
+
+# ------------------------------------------------
+# build_identity_table
+# ------------------------------------------------
+
+def test_build_identity_table_one_row_per_identity():
+    names = ["Alice Smith", "Alice Smith", "Bob Brown"]
+    emails = ["alice@example.com", "alice@example.com", "bob@example.com"]
+    table = build_identity_table(names, emails)
+    assert list(table.columns) == IDENTITY_COLUMNS
+    assert len(table) == 2
+    assert list(table.index) == [0, 1]
+
+
+def test_build_identity_table_precomputed_fields():
+    table = build_identity_table(["José M. López"], ["123+jlopez@users.noreply.github.com"])
+    row = table.iloc[0]
+    assert row["norm_name"] == "jose m lopez"
+    assert (row["first"], row["last"]) == ("José", "López")
+    assert (row["norm_first"], row["norm_last"]) == ("jose", "lopez")
+    assert row["initials"] == "jml"
+    assert row["local"] == "123+jlopez"
+    assert row["domain"] == "users.noreply.github.com"
+    assert row["gh_handle"] == "jlopez"
+    assert row["soundex_last"] != ""
+
+
+def test_build_identity_table_missing_values():
+    table = build_identity_table([None, np.nan], ["", None])
+    assert len(table) == 1
+    assert table.loc[0, "norm_name"] == ""
+    assert table.loc[0, "local"] == ""
+
+
+# ------------------------------------------------
+# identity_ids / pair_identity_ids
+# ------------------------------------------------
+
+def test_identity_ids_lookup_and_missing():
+    table = build_identity_table(["A", "B"], ["a@x.com", "b@x.com"])
+    assert list(identity_ids(table, ["B", "A"], ["b@x.com", "a@x.com"])) == [1, 0]
+    with pytest.raises(KeyError):
+        identity_ids(table, ["C"], ["c@x.com"])
+
+
+def test_pair_identity_ids_shares_identities_across_sides():
+    df = pd.DataFrame({
+        "name_1": ["A", "B"], "email_1": ["a@x.com", "b@x.com"],
+        "name_2": ["B", "A"], "email_2": ["b@x.com", "a@x.com"],
+    })
+    table, left, right = pair_identity_ids(df)
+    assert len(table) == 2
+    assert list(left) == list(right[::-1])
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+
+from ML.src import blocking, features, ml_predict
+from ML.src.dedup_index import DedupIndex
+
+# the instrumentation module the pipeline code reports to
+instrumentation = features.instrumentation
+
+
+def _records():
+    return [
+        {"name": "Alice Smith", "email": "alice@acme.io"},
+        {"name": "Alice Smyth", "email": "asmith@acme.io"},
+        {"name": "Bob Jones", "email": "bob@acme.io"},
+        {"name": "Bobby Jones", "email": "bjones@acme.io"},
+    ]
+
+
+def test_stage_times_and_report(tmp_path):
+    profiler = instrumentation.PipelineProfiler(trace_memory=True)
+    with profiler:
+        with profiler.stage("work"):
+            sum(range(10000))
+            profiler.count("items", 3)
+            profiler.count("items", 2)
+    assert instrumentation.active() is None
+
+    [stage] = profiler.stages
+    assert stage["stage"] == "work"
+    assert stage["wall_s"] >= 0 and stage["cpu_s"] >= 0
+    assert stage["counts"] == {"items": 5}
+    assert "peak_traced_mb" in stage
+
+    out = tmp_path / "report.json"
+    profiler.write(out)
+    report = json.loads(out.read_text())
+    assert [s["stage"] for s in report["stages"]] == ["work"]
+
+
+def test_feature_times_and_blocking_counts():
+    records = _records()
+    with instrumentation.PipelineProfiler() as profiler:
+        with profiler.stage("block"):
+            table, left, right = blocking.merge_candidate_pairs(records)
+            X = features.pair_features(table, left, right)
+
+    [stage] = profiler.stages
+    assert set(stage["features"]) == set(features.FEATURE_NAMES)
+    assert stage["counts"]["pairs_featurized"] == len(left) == len(X)
+    passes = stage["blocking"]
+    assert set(passes) >= {"|".join(k) for k in blocking.KEY_PASSES}
+    assert sum(p["new_pairs"] for p in passes.values()) == len(left)
+
+
+def test_inactive_is_noop():
+    assert instrumentation.active() is None
+    table, left, right = blocking.merge_candidate_pairs(_records())
+    timed = None
+    with instrumentation.PipelineProfiler() as profiler:
+        with profiler.stage("features"):
+            timed = features.pair_features(table, left, right)
+    assert np.array_equal(features.pair_features(table, left, right), timed)
+    assert ml_predict.instrumentation is instrumentation
+
+
+class _ConstantModel:
+    def predict_proba(self, X):
+        return np.tile([0.5, 0.5], (len(X), 1))
+
+
+def test_dedup_index_reports_blocking_counts():
+    index = DedupIndex()
+    index.add(["Alice Smith"], ["alice@acme.io"], _ConstantModel())
+    with instrumentation.PipelineProfiler() as profiler:
+        with profiler.stage("update_index"):
+            index.add(["Alice Smyth"], ["asmyth@acme.io"], _ConstantModel())
+    passes = profiler.stages[0]["blocking"]
+    assert passes["domain|lastname_initial"]["pairs"] == 1
+    assert passes["lastname_initial"]["pairs"] == 1
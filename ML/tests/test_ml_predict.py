@@ -0,0 +1,118 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from ML.src.features import FEATURE_NAMES
+from ML.src.ml_predict import score_candidates, score_candidates_streaming, cut_scored
+
+
+# ------------------------------------------------
+# Helpers
+# ------------------------------------------------
+
+def make_candidates_csv(path, n=30):
+    rows = []
+    for i in range(n):
+        rows.append({
+            "name_1": f"Dev Number{i}", "email_1": f"dev{i}@example.com",
+            "name_2": f"Dev Numbr{i % 7}", "email_2": f"dnumber{i % 5}@example.org",
+            "c1": 0.5,
+        })
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def make_model(path, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((40, len(FEATURE_NAMES)))
+    y = np.array([0, 1] * 20)
+    joblib.dump(LogisticRegression().fit(X, y), path)
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    cands = tmp_path / "cands.csv"
+    model = tmp_path / "model.pkl"
+    make_candidates_csv(cands)
+    make_model(model)
+    return cands, model, tmp_path
+
+
+# ------------------------------------------------
+# score_candidates_streaming
+# ------------------------------------------------
+
+def test_streaming_topk_matches_in_memory(inputs):
+    cands, model, tmp = inputs
+    score_candidates(cands, model, tmp / "full.csv", topk=5)
+    score_candidates(cands, model, tmp / "stream.csv", topk=5, chunksize=4)
+    full = pd.read_csv(tmp / "full.csv")
+    stream = pd.read_csv(tmp / "stream.csv")
+    assert len(stream) == 5
+    assert np.allclose(stream["proba"].values, full["proba"].values)
+
+
+def test_streaming_threshold_keeps_same_rows(inputs):
+    cands, model, tmp = inputs
+    score_candidates(cands, model, tmp / "full.csv", threshold=0.5)
+    score_candidates_streaming(cands, model, tmp / "stream.csv", threshold=0.5, chunksize=7)
+    full = pd.read_csv(tmp / "full.csv")
+    stream = pd.read_csv(tmp / "stream.csv")
+    key = ["email_1", "email_2"]
+    assert len(stream) == len(full)
+    assert (stream["proba"] >= 0.5).all()
+    assert stream.sort_values(key).reset_index(drop=True)[key].equals(
+        full.sort_values(key).reset_index(drop=True)[key]
+    )
+
+
+def test_streaming_without_filter_keeps_input_order(inputs):
+    cands, model, tmp = inputs
+    score_candidates_streaming(cands, model, tmp / "stream.csv", chunksize=8)
+    stream = pd.read_csv(tmp / "stream.csv")
+    assert list(stream["email_1"]) == list(pd.read_csv(cands)["email_1"])
+    assert "proba" in stream.columns
+
+
+def test_streaming_empty_input_writes_header(inputs):
+    _, model, tmp = inputs
+    cands = tmp / "empty.csv"
+    pd.DataFrame(columns=["name_1", "email_1", "name_2", "email_2"]).to_csv(cands, index=False)
+    score_candidates_streaming(cands, model, tmp / "out.csv", threshold=0.5, chunksize=10)
+    out = pd.read_csv(tmp / "out.csv")
+    assert len(out) == 0
+    assert "proba" in out.columns
+
+
+def test_streaming_parquet_matches_csv(inputs):
+    pytest.importorskip("pyarrow")
+    cands, model, tmp = inputs
+    parquet = tmp / "cands.parquet"
+    pd.read_csv(cands).to_parquet(parquet, index=False)
+    score_candidates_streaming(cands, model, tmp / "out.csv", chunksize=7)
+    score_candidates_streaming(parquet, model, tmp / "out.parquet", chunksize=7)
+    expected = pd.read_csv(tmp / "out.csv")
+    got = pd.read_parquet(tmp / "out.parquet")
+    assert len(got) == 30
+    assert got["email_1"].tolist() == expected["email_1"].tolist()
+    assert np.allclose(got["proba"], expected["proba"])
+
+
+# ------------------------------------------------
+# cut_scored
+# ------------------------------------------------
+
+def test_cut_scored_matches_scoring_with_threshold(inputs):
+    cands, model, tmp = inputs
+    score_candidates(cands, model, tmp / "all.csv", chunksize=7)
+    t = float(pd.read_csv(tmp / "all.csv")["proba"].median())
+    score_candidates(cands, model, tmp / "full.csv", threshold=t)
+    cut_scored(tmp / "all.csv", tmp / "cut.csv", threshold=t, chunksize=4)
+    full = pd.read_csv(tmp / "full.csv")
+    cut = pd.read_csv(tmp / "cut.csv")
+    assert len(cut) == len(full) > 0
+    assert np.allclose(cut["proba"].values, full["proba"].values)
+
+    cut_scored(tmp / "all.csv", tmp / "top.csv", topk=3, chunksize=4)
+    assert np.allclose(pd.read_csv(tmp / "top.csv")["proba"].values, full["proba"].values[:3])
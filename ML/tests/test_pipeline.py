@@ -0,0 +1,59 @@
+import json
+
+from ML.src.pipeline import Stage, run_stages
+
+
+def _stages(tmp_path, calls, threshold):
+    src = tmp_path / "in.txt"
+    mid = tmp_path / "mid.txt"
+    out = tmp_path / "out.txt"
+
+    def double():
+        calls.append("double")
+        mid.write_text(src.read_text() * 2)
+
+    def cut():
+        calls.append("cut")
+        out.write_text(mid.read_text()[:threshold])
+
+    return [
+        Stage("double", double, inputs=[str(src)], outputs=[str(mid)]),
+        Stage("cut", cut, inputs=[str(mid)], outputs=[str(out)], params={"n": threshold}),
+    ]
+
+
+def test_unchanged_stages_are_skipped(tmp_path):
+    (tmp_path / "in.txt").write_text("abc")
+    state = str(tmp_path / "state.json")
+    calls = []
+    assert run_stages(_stages(tmp_path, calls, 4), state) == ["double", "cut"]
+    assert run_stages(_stages(tmp_path, calls, 4), state) == []
+    assert calls == ["double", "cut"]
+    assert set(json.loads((tmp_path / "state.json").read_text())["stages"]) == {"double", "cut"}
+
+
+def test_param_change_reruns_only_downstream(tmp_path):
+    (tmp_path / "in.txt").write_text("abc")
+    state = str(tmp_path / "state.json")
+    run_stages(_stages(tmp_path, [], 4), state)
+    calls = []
+    assert run_stages(_stages(tmp_path, calls, 2), state) == ["cut"]
+    assert (tmp_path / "out.txt").read_text() == "ab"
+
+
+def test_input_change_reruns_dependents(tmp_path):
+    (tmp_path / "in.txt").write_text("abc")
+    state = str(tmp_path / "state.json")
+    run_stages(_stages(tmp_path, [], 4), state)
+    (tmp_path / "in.txt").write_text("xyz")
+    assert run_stages(_stages(tmp_path, [], 4), state) == ["double", "cut"]
+    assert (tmp_path / "out.txt").read_text() == "xyzx"
+
+
+def test_missing_output_or_force_reruns(tmp_path):
+    (tmp_path / "in.txt").write_text("abc")
+    state = str(tmp_path / "state.json")
+    run_stages(_stages(tmp_path, [], 4), state)
+    (tmp_path / "out.txt").unlink()
+    assert run_stages(_stages(tmp_path, [], 4), state) == ["cut"]
+    assert run_stages(_stages(tmp_path, [], 4), state, force=True) == ["double", "cut"]
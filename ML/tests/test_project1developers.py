@@ -0,0 +1,219 @@
+import os
+import subprocess
+
+import numpy as np
+import pytest
+
+import project1developers as p1
+
+
+# ------------------------------------------------
+# Bird threshold pruning
+# ------------------------------------------------
+
+DEVS = [
+    ["Alice Smith", "alice.smith@example.com"],
+    ["Alice Smyth", "asmyth@example.com"],
+    ["Smith Alice", "alice@other.org"],
+    ["alice", "alice@example.com"],
+    ["", "alice@example.com"],
+    ["", "@example.com"],
+    ["Bob", ""],
+    ["José Núñez", "jose.nunez@example.com"],
+    ["Jose Nunez", "jnunez@example.com"],
+    ["J. R. R. Tolkien", "jrrt@example.com"],
+    ["Li", "li@example.com"],
+    ["Al", "a@example.com"],
+]
+
+
+def _brute_force(devs, pairs, t):
+    processed = [p1.process(dev) for dev in devs]
+    rows = []
+    for i, j in pairs:
+        scores = p1.bird_scores(processed[i], processed[j])
+        row = [devs[i][0], processed[i][5], devs[j][0], processed[j][5], *scores]
+        if p1.passes_threshold(row, t):
+            rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize("t", [0.0, 0.3, 0.5, 0.65, 0.7, 0.8, 0.9, 1.0])
+def test_thresholded_rows_match_filtered_full_table(t):
+    pairs = list(p1.candidate_pairs(DEVS, mode="exhaustive"))
+    expected = _brute_force(DEVS, pairs, t)
+    assert list(p1.similarity_rows(DEVS, pairs, threshold=t, chunk_size=7)) == expected
+
+
+def test_blocked_keeps_same_email_name_variants():
+    devs = [
+        ["Ann Lee", "ann@acme.io"],
+        ["Ann  Lee", "ann@acme.io"],
+        ["A. Lee", "ann@acme.io"],
+        ["Annie Lee", "ann.lee@acme.io"],
+    ]
+    blocked = sorted(p1.candidate_pairs(devs, mode="blocked"))
+    assert blocked == sorted(p1.candidate_pairs(devs, mode="exhaustive"))
+    assert len(_brute_force(devs, blocked, 0.65)) == 6
+
+
+def test_ratio_bound_is_an_upper_bound():
+    words = ["", "a", "ab", "abc", "alice", "alicia", "bob", "smith", "smyth"]
+    for a in words:
+        for b in words:
+            bound = p1.ratio_bound(np.array([len(a)]), np.array([len(b)]))[0]
+            assert p1.sim(a, b) <= bound + 1e-12
+
+
+# ------------------------------------------------
+# mining from temporary repositories
+# ------------------------------------------------
+
+def _git(repo, *args, env=None):
+    return subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True,
+                          text=True, env=env).stdout.strip()
+
+
+def _init_repo(path):
+    path.mkdir()
+    _git(path, "init", "-q", "-b", "main")
+    return path
+
+
+_clock = [1_600_000_000]
+
+
+def _commit(repo, author, committer=None, message="change"):
+    # author/committer are (name, email); every commit is one minute later
+    committer = committer or author
+    _clock[0] += 60
+    env = dict(os.environ,
+               GIT_AUTHOR_NAME=author[0], GIT_AUTHOR_EMAIL=author[1],
+               GIT_AUTHOR_DATE=f"@{_clock[0]} +0000",
+               GIT_COMMITTER_NAME=committer[0], GIT_COMMITTER_EMAIL=committer[1],
+               GIT_COMMITTER_DATE=f"@{_clock[0] + 30} +0000")
+    # one file per commit, so branches merge without conflicts
+    (repo / f"{_clock[0]}.txt").write_text(message)
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "-m", message, env=env)
+    return _git(repo, "rev-parse", "HEAD")
+
+
+ALICE = ("Alice Smith", "alice@example.com")
+BOB = ("Bob Jones", "bob@example.com")
+CAROL = ("Carol Young", "carol@example.com")
+DAVE = ("Dave Ray", "dave@example.com")
+
+
+def _incremental(repo, out):
+    return p1.mine_developers_incremental(str(repo), str(out / "devs.csv"),
+                                          str(out / "state.json"),
+                                          stats_csv=str(out / "stats.csv"), backend="git")
+
+
+def _stats(out):
+    return p1.read_identity_stats(str(out / "stats.csv"))
+
+
+def test_incremental_mining(tmp_path):
+    repo = _init_repo(tmp_path / "repo")
+    out = tmp_path / "out"
+    out.mkdir()
+    base = _commit(repo, ALICE)
+    _commit(repo, ALICE, committer=BOB)
+
+    # first run: full walk
+    assert _incremental(repo, out) == sorted([ALICE, BOB])
+    assert _stats(out) == p1.mine_identities(str(repo), "git")
+
+    # no-op rerun leaves the outputs alone
+    mtime = os.stat(out / "stats.csv").st_mtime_ns
+    assert _incremental(repo, out) == sorted([ALICE, BOB])
+    assert os.stat(out / "stats.csv").st_mtime_ns == mtime
+
+    # a branch forked before the watermark and merged after it
+    _git(repo, "checkout", "-q", "-b", "feature", base)
+    _commit(repo, CAROL)
+    _git(repo, "checkout", "-q", "main")
+    _commit(repo, ALICE)
+    assert _incremental(repo, out) == sorted([ALICE, BOB])
+    env = dict(os.environ, GIT_AUTHOR_NAME=ALICE[0], GIT_AUTHOR_EMAIL=ALICE[1],
+               GIT_COMMITTER_NAME=ALICE[0], GIT_COMMITTER_EMAIL=ALICE[1])
+    _git(repo, "merge", "-q", "--no-ff", "-m", "merge", "feature", env=env)
+    assert _incremental(repo, out) == sorted([ALICE, BOB, CAROL])
+    assert _stats(out) == p1.mine_identities(str(repo), "git")
+
+
+def test_incremental_mining_rewritten_history(tmp_path):
+    repo = _init_repo(tmp_path / "repo")
+    out = tmp_path / "out"
+    out.mkdir()
+    base = _commit(repo, ALICE)
+    _commit(repo, BOB)
+    _incremental(repo, out)
+
+    # the watermark is no longer an ancestor of HEAD: full walk
+    _git(repo, "reset", "-q", "--hard", base)
+    _commit(repo, DAVE)
+    assert _incremental(repo, out) == sorted([ALICE, DAVE])
+    assert _stats(out) == p1.mine_identities(str(repo), "git")
+
+
+def test_incremental_mining_missing_stats_walks_everything(tmp_path):
+    repo = _init_repo(tmp_path / "repo")
+    out = tmp_path / "out"
+    out.mkdir()
+    _commit(repo, ALICE)
+    _incremental(repo, out)
+    _commit(repo, BOB)
+    os.remove(out / "stats.csv")
+    assert _incremental(repo, out) == sorted([ALICE, BOB])
+    assert _stats(out) == p1.mine_identities(str(repo), "git")
+
+
+def test_parse_git_log_record():
+    record = "Zoë Ünal\x1fzoe@example.com\x1f100\x1fBot, CI\x1fci@example.com\x1f200".encode()
+    assert p1._parse_git_log_record(record) == (
+        "Zoë Ünal", "zoe@example.com", 100, "Bot, CI", "ci@example.com", 200)
+
+
+def test_collect_identities_counts_author_committer_once():
+    commits = [
+        ("Alice", "a@x.com", 10, "Alice", "a@x.com", 20),
+        ("Alice", "a@x.com", 30, "Bob", "b@x.com", 40),
+        ("Bob", "b@x.com", 50, "Bob", "b@x.com", 5),
+    ]
+    stats = p1.collect_identities(commits)
+    assert stats == {("Alice", "a@x.com"): [2, 10, 30], ("Bob", "b@x.com"): [2, 5, 40]}
+
+
+def test_git_backend_matches_pydriller(tmp_path):
+    pytest.importorskip("pydriller")
+    repo = _init_repo(tmp_path / "repo")
+    _commit(repo, ("Zoë Ünal", "zoe@example.com"), message="multi\nline\x1fmessage")
+    _commit(repo, ALICE, committer=BOB)
+    _commit(repo, ("Name, With Comma", "comma@example.com"))
+    git_commits = list(p1.git_log_commits(str(repo)))
+    assert len(git_commits) == 3
+    assert sorted(git_commits) == sorted(p1.pydriller_commits(str(repo)))
+    assert p1.mine_identities(str(repo), "git") == p1.mine_identities(str(repo), "pydriller")
+    assert p1.mine_identities(str(repo), "git")[ALICE][0] == 1
+
+
+def test_merge_identities():
+    stats, repos = p1.merge_identities([
+        ("repo_a", {ALICE: [3, 100, 200], BOB: [1, 150, 150]}),
+        ("repo_b", {ALICE: [2, 50, 180], CAROL: [4, 10, 20]}),
+        ("repo_c", {ALICE: [1, 120, 300]}),
+    ])
+    assert stats == {ALICE: [6, 50, 300], BOB: [1, 150, 150], CAROL: [4, 10, 20]}
+    assert repos == {ALICE: {"repo_a", "repo_b", "repo_c"}, BOB: {"repo_a"}, CAROL: {"repo_b"}}
+
+
+def test_write_identity_stats_repos_column(tmp_path):
+    path = tmp_path / "stats.csv"
+    p1.write_identity_stats({ALICE: [6, 50, 300]}, str(path), repos={ALICE: {"b", "a"}})
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "name,email,commits,first_seen,last_seen,repos"
+    assert lines[1].endswith(",a;b")
+    assert p1.read_identity_stats(str(path)) == {ALICE: [6, 50, 300]}
@@ -0,0 +1,81 @@
+import json
+import threading
+import urllib.request
+import numpy as np
+import pytest
+
+from ML.src.dedup_index import DedupIndex
+from ML.src.features import FEATURE_NAMES, build_features
+from ML.src.resolver import Resolver, make_server
+
+
+class LinearModel:
+    """Logistic model on name_jw only: proba = sigmoid(20 * (name_jw - 0.9))."""
+
+    def __init__(self):
+        self.coef_ = np.zeros((1, len(FEATURE_NAMES)))
+        self.coef_[0, 0] = 20.0
+        self.intercept_ = np.array([-18.0])
+
+    def predict_proba(self, X):
+        p = 1 / (1 + np.exp(-(np.asarray(X) @ self.coef_.ravel() + self.intercept_[0])))
+        return np.column_stack([1 - p, p])
+
+
+@pytest.fixture
+def resolver():
+    index = DedupIndex(threshold=0.5)
+    index.add(["Alice Smith", "Alice Smith", "Bob Jones"],
+              ["alice@example.com", "asmith@example.com", "bob@example.com"], LinearModel())
+    return Resolver(index, LinearModel())
+
+
+# ------------------------------------------------
+# Resolver.resolve
+# ------------------------------------------------
+
+def test_resolve_known_identity(resolver):
+    result = resolver.resolve("Bob Jones", "bob@example.com")
+    assert result["email"] == "bob@example.com"
+    assert result["proba"] == 1.0
+    assert result["match"]
+
+
+def test_resolve_new_identity_matches_cluster(resolver):
+    result = resolver.resolve("Alice Smyth", "alice.smyth@example.com")
+    clusters = resolver.index.clusters().set_index("email")["cluster_id"]
+    assert result["cluster_id"] == clusters["alice@example.com"]
+    assert result["match"]
+
+    model = LinearModel()
+    X = build_features(("Alice Smyth", "alice.smyth@example.com"), (result["name"], result["email"]))
+    assert result["proba"] == pytest.approx(model.predict_proba(X.reshape(1, -1))[0, 1], abs=1e-12)
+
+
+def test_resolve_does_not_modify_index(resolver):
+    resolver.resolve("Carol King", "carol@example.com")
+    assert len(resolver.index) == 3
+
+
+def test_resolve_no_candidates():
+    index = DedupIndex()
+    assert Resolver(index, LinearModel()).resolve("Solo", "solo@x.com") is None
+
+
+# ------------------------------------------------
+# make_server
+# ------------------------------------------------
+
+def test_http_resolve(resolver):
+    server = make_server(resolver, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        port = server.server_address[1]
+        url = f"http://127.0.0.1:{port}/resolve?name=Bob+Jones&email=bob%40example.com"
+        with urllib.request.urlopen(url) as response:
+            result = json.loads(response.read())
+        assert result["email"] == "bob@example.com"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,44 @@
+import jellyfish
+from Levenshtein import ratio
+from rapidfuzz.distance import JaroWinkler
+
+from ML.src.similarity_cache import (
+    jaro_winkler,
+    levenshtein_ratio,
+    phonetic_codes,
+    cache_stats,
+    clear_caches,
+)
+
+
+# ------------------------------------------------
+# cached kernels
+# ------------------------------------------------
+
+def test_values_match_uncached():
+    for a, b in [("alice", "alicia"), ("", "bob"), ("smith", "smyth"), ("", "")]:
+        assert jaro_winkler(a, b) == JaroWinkler.normalized_similarity(a, b)
+        assert levenshtein_ratio(a, b) == ratio(a, b)
+    assert phonetic_codes("smith") == (jellyfish.soundex("smith"), jellyfish.metaphone("smith"))
+
+
+def test_symmetric_pairs_share_entry():
+    clear_caches()
+    jaro_winkler("alice", "bob")
+    jaro_winkler("bob", "alice")
+    stats = cache_stats()["jaro_winkler"]
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["size"] == 1
+
+
+def test_cache_stats_and_clear():
+    clear_caches()
+    levenshtein_ratio("john", "jon")
+    levenshtein_ratio("john", "jon")
+    stats = cache_stats()
+    assert stats["levenshtein_ratio"]["hits"] == 1
+    assert stats["levenshtein_ratio"]["maxsize"] > 0
+    assert set(stats) == {"jaro_winkler", "levenshtein_ratio", "phonetic_codes"}
+    clear_caches()
+    assert cache_stats()["levenshtein_ratio"]["size"] == 0
@@ -0,0 +1,33 @@
+from ML.src.synthetic import generate_identities, true_pairs
+
+
+def test_exact_size_and_unique_identities():
+    df = generate_identities(500, seed=1)
+    assert len(df) == 500
+    assert list(df.columns) == ["name", "email", "person_id"]
+    assert not df.duplicated(["name", "email"]).any()
+
+
+def test_deterministic_for_seed():
+    a = generate_identities(300, seed=7)
+    b = generate_identities(300, seed=7)
+    c = generate_identities(300, seed=8)
+    assert a.equals(b)
+    assert not a.equals(c)
+
+
+def test_contains_alias_kinds():
+    df = generate_identities(2000, seed=0)
+    emails = df["email"]
+    assert emails.str.contains(r"\+.*@gmail\.com$").any()
+    assert emails.str.endswith("@users.noreply.github.com").any()
+    assert df["name"].str.contains(r"\[bot\]").any()
+
+
+def test_true_pairs_match_person_ids():
+    df = generate_identities(400, seed=2)
+    pairs = true_pairs(df)
+    person = df["person_id"].tolist()
+    assert all(i < j and person[i] == person[j] for i, j in pairs)
+    sizes = df.groupby("person_id").size()
+    assert len(pairs) == int((sizes * (sizes - 1) // 2).sum())
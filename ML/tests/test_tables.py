@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ML.src.tables import (
+    is_parquet,
+    write_table,
+    read_table,
+    read_columns,
+    iter_table,
+    TableWriter,
+)
+
+pytest.importorskip("pyarrow")
+
+COLUMNS = ["name_1", "email_1", "name_2", "email_2", "c1", "c2", "c3.1", "c3.2",
+           "c4", "c5", "c6", "c7"]
+
+
+def _similarity_rows(n):
+    return [
+        [f"Dev {i}", f"dev{i}@x.com", f"Dev {i + 1}", f"dev{i + 1}@x.com",
+         0.123456789, 0.5, 1.0, 0.0, True, False, i % 2 == 0, False]
+        for i in range(n)
+    ]
+
+
+# ------------------------------------------------
+# write_table / read_table
+# ------------------------------------------------
+
+def test_is_parquet():
+    assert is_parquet("a/b.parquet")
+    assert not is_parquet("a/b.csv")
+
+
+def test_parquet_round_trip_types(tmp_path):
+    df = pd.DataFrame(_similarity_rows(5), columns=COLUMNS)
+    df["proba"] = np.linspace(0, 1, 5)
+    path = tmp_path / "t.parquet"
+    write_table(df, path)
+    out = read_table(path)
+    assert out["c1"].dtype == np.float32
+    assert out["c4"].dtype == bool
+    assert out["proba"].dtype == np.float64
+    assert out["name_1"].dtype == object
+    assert out["name_1"].tolist() == df["name_1"].tolist()
+    assert np.allclose(out["c1"], df["c1"], atol=1e-7)
+    assert out["c6"].tolist() == df["c6"].tolist()
+
+
+def test_csv_passthrough(tmp_path):
+    df = pd.DataFrame(_similarity_rows(3), columns=COLUMNS)
+    path = tmp_path / "t.csv"
+    write_table(df, path)
+    assert read_table(path, columns=["name_1", "c1"]).equals(pd.read_csv(path)[["name_1", "c1"]])
+
+
+def test_column_projection(tmp_path):
+    path = tmp_path / "t.parquet"
+    write_table(pd.DataFrame(_similarity_rows(3), columns=COLUMNS), path)
+    assert list(read_table(path, columns=["email_1", "c7"]).columns) == ["email_1", "c7"]
+    assert read_columns(path) == COLUMNS
+
+
+# ------------------------------------------------
+# TableWriter / iter_table
+# ------------------------------------------------
+
+def test_table_writer_streams_row_groups(tmp_path):
+    path = tmp_path / "t.parquet"
+    with TableWriter(path, COLUMNS, batch_size=4) as writer:
+        writer.write_rows(_similarity_rows(10))
+    assert writer.rows == 10
+    chunks = list(iter_table(path, batch_size=4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert pd.concat(chunks)["name_1"].tolist() == [f"Dev {i}" for i in range(10)]
+
+
+def test_table_writer_csv_matches_csv_module(tmp_path):
+    import csv
+    rows = _similarity_rows(3)
+    with TableWriter(tmp_path / "a.csv", COLUMNS) as writer:
+        writer.write_rows(rows)
+    with open(tmp_path / "b.csv", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(COLUMNS)
+        w.writerows(rows)
+    assert (tmp_path / "a.csv").read_bytes() == (tmp_path / "b.csv").read_bytes()
+
+
+def test_table_writer_empty(tmp_path):
+    path = tmp_path / "t.parquet"
+    with TableWriter(path, COLUMNS):
+        pass
+    out = read_table(path)
+    assert list(out.columns) == COLUMNS
+    assert len(out) == 0
@@ -1,45 +1,246 @@
+import argparse
 import csv
-import pandas as pd
+import json
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 import unicodedata
 import string
-from itertools import combinations
-from Levenshtein import ratio as sim
+import sys
+from itertools import combinations, islice
+import numpy as np
+from rapidfuzz import process as rf_process
+from rapidfuzz.distance import Indel
 import os
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_PATH = os.path.join(BASE_DIR, "immich")
+OUT_DIR = "project1devs"
+
+# The candidate blocking from the ML pipeline lives in ML/src
+sys.path.insert(0, os.path.join(BASE_DIR, "ML"))
+
+# Levenshtein ratio behind a bounded cache shared with the ML features;
+# first names and email prefixes repeat across many pairs
+from src.similarity_cache import levenshtein_ratio as sim, cache_stats  # noqa: E402
+from src.tables import TableWriter  # noqa: E402
+
+SIMILARITY_COLUMNS = ["name_1", "email_1", "name_2", "email_2", "c1", "c2",
+                      "c3.1", "c3.2", "c4", "c5", "c6", "c7"]
+
+
 # This block of code take the repository, fetches all the commits,
 # retrieves name and email of both the author and commiter and saves the unique
 # pairs to cs
 # If you provide a URL, it clones the repo, fetches the commits and then deletes it,
 # so for a big project better clone the repo locally and provide filesystem path
+#
+# Commits are read as (author name, author email, author time,
+# committer name, committer email, committer time) tuples, with
+# `rev` an optional git revision range such as "abc123..HEAD".
+def pydriller_commits(repo_path, rev=None):
+    from pydriller import Git, Repository
 
-from pydriller import Repository
+    if rev is None:
+        commits = Repository(repo_path).traverse_commits()
+    else:
+        commits = Git(repo_path).get_list_commits(rev)
+    for commit in commits:
+        yield (commit.author.name, commit.author.email, int(commit.author_date.timestamp()),
+               commit.committer.name, commit.committer.email, int(commit.committer_date.timestamp()))
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-REPO_PATH = os.path.join(BASE_DIR, "immich")
 
-DEVS = set()
-for commit in Repository(REPO_PATH).traverse_commits():
-    DEVS.add((commit.author.name, commit.author.email))
-    DEVS.add((commit.committer.name, commit.committer.email))
+# Same tuples streamed from `git log`, without building PyDriller/GitPython
+# commit objects. Fields are separated by \x1f and commits by NUL (-z);
+# --no-mailmap keeps the raw names/emails that PyDriller reports.
+# Only works on a local repository path
+def git_log_commits(repo_path, rev=None):
+    cmd = ["git", "-C", repo_path, "log", "--no-mailmap", "--encoding=UTF-8", "-z",
+           "--format=%an%x1f%ae%x1f%at%x1f%cn%x1f%ce%x1f%ct", rev or "HEAD"]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        pending = b""
+        for block in iter(lambda: proc.stdout.read(1 << 16), b""):
+            pending += block
+            *records, pending = pending.split(b"\0")
+            for record in records:
+                yield _parse_git_log_record(record)
+        if pending:
+            yield _parse_git_log_record(pending)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
 
-DEVS = sorted(DEVS)
 
-with open(os.path.join("project1devs", "devs.csv"), 'w', newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile, delimiter=',', quotechar='"')
-    writer.writerow(["name", "email"])
-    writer.writerows(DEVS)
-#
+def _parse_git_log_record(record):
+    a_name, a_email, a_time, c_name, c_email, c_time = record.decode("utf-8", "replace").split("\x1f")
+    return a_name, a_email, int(a_time), c_name, c_email, int(c_time)
 
-# This block of code reads an existing csv of developers
 
-DEVS = []
-# Read csv file with name,dev columns
-with open(os.path.join("project1devs", "devs.csv"), 'r', newline='', encoding='utf-8') as csvfile:
-    reader = csv.reader(csvfile, delimiter=',')
-    for row in reader:
-        DEVS.append(row)
-# First element is header, skip
-DEVS = DEVS[1:]
+COMMIT_BACKENDS = {"pydriller": pydriller_commits, "git": git_log_commits}
+
+
+# Per identity: number of commits it authored or committed, and the
+# first/last time (unix seconds) it was seen
+def collect_identities(commits, stats=None):
+    if stats is None:
+        stats = {}
+    for a_name, a_email, a_time, c_name, c_email, c_time in commits:
+        seen = {(a_name, a_email): a_time}
+        key = (c_name, c_email)
+        seen[key] = min(seen.get(key, c_time), c_time)
+        for dev, when in seen.items():
+            entry = stats.get(dev)
+            if entry is None:
+                stats[dev] = [1, when, when]
+            else:
+                entry[0] += 1
+                entry[1] = min(entry[1], when)
+                entry[2] = max(entry[2], when)
+    return stats
+
+
+def mine_identities(repo_path, backend="pydriller", rev=None):
+    return collect_identities(COMMIT_BACKENDS[backend](repo_path, rev))
+
+
+def mine_developers(repo_path, backend="pydriller"):
+    return sorted(mine_identities(repo_path, backend))
+
+
+# Mine several local repositories concurrently (one process per repository)
+# and merge their identities: commit counts are summed, first/last seen
+# widened, and each identity is tagged with the repositories it appeared in.
+# Returns (stats, repos) where repos maps each identity to a set of paths
+def mine_repositories(repo_paths, backend="pydriller", n_jobs=None):
+    repo_paths = list(repo_paths)
+    workers = min(n_jobs or os.cpu_count() or 1, max(len(repo_paths), 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        per_repo = list(pool.map(mine_identities, repo_paths, [backend] * len(repo_paths)))
+    return merge_identities(zip(repo_paths, per_repo))
+
+
+def merge_identities(per_repo):
+    stats = {}
+    repos = {}
+    for repo, repo_stats in per_repo:
+        for dev, (commits, first, last) in repo_stats.items():
+            entry = stats.get(dev)
+            if entry is None:
+                stats[dev] = [commits, first, last]
+            else:
+                entry[0] += commits
+                entry[1] = min(entry[1], first)
+                entry[2] = max(entry[2], last)
+            repos.setdefault(dev, set()).add(repo)
+    return stats, repos
+
+
+# Incremental mining: the last mined HEAD is stored next to devs.csv and the
+# next run only walks the commits reachable from HEAD but not from it
+# (git rev-list last..HEAD), merging the new identities into devs.csv and
+# their counts into the stats file.
+# Falls back to a full walk when there is no state for this repository, the
+# stored commit is no longer an ancestor of HEAD (rewritten history) or
+# devs.csv or the stats file is missing.
+# Only works on a local repository path
+def mine_developers_incremental(repo_path, devs_csv, state_json, stats_csv=None, backend="pydriller"):
+    head = _git(repo_path, "rev-parse", "HEAD")
+    repo_key = os.path.abspath(repo_path)
+
+    state = {}
+    if os.path.exists(state_json):
+        with open(state_json, encoding='utf-8') as f:
+            state = json.load(f)
+
+    last = state.get("last_commit") if state.get("repo") == repo_key else None
+    # a missing stats file would otherwise be rewritten with the new commits only
+    have_outputs = os.path.exists(devs_csv) and (stats_csv is None or os.path.exists(stats_csv))
+    if last and have_outputs and _is_ancestor(repo_path, last, head):
+        stats = {}
+        if stats_csv is not None:
+            stats = read_identity_stats(stats_csv)
+        devs = set(stats) | {tuple(dev) for dev in read_devs(devs_csv)}
+        if last != head:
+            collect_identities(COMMIT_BACKENDS[backend](repo_path, f"{last}..{head}"), stats)
+            devs |= set(stats)
+        new_commits = last != head
+    else:
+        stats = mine_identities(repo_path, backend)
+        devs = set(stats)
+        new_commits = True
+
+    if new_commits or not os.path.exists(devs_csv):
+        write_devs(sorted(devs), devs_csv)
+        if stats_csv is not None:
+            write_identity_stats(stats, stats_csv)
+    with open(state_json, 'w', encoding='utf-8') as f:
+        json.dump({"repo": repo_key, "last_commit": head}, f, indent=2)
+    return sorted(devs)
+
+
+def _git(repo_path, *args):
+    out = subprocess.run(["git", "-C", repo_path, *args], check=True,
+                         capture_output=True, text=True)
+    return out.stdout.strip()
+
+
+def _is_ancestor(repo_path, ancestor, head):
+    try:
+        _git(repo_path, "merge-base", "--is-ancestor", ancestor, head)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+
+# With `repos` (identity -> set of repositories) a ";"-separated repos column is added
+def write_identity_stats(stats, path, repos=None):
+    header = ["name", "email", "commits", "first_seen", "last_seen"]
+    if repos is not None:
+        header.append("repos")
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        for (name, email), (commits, first, last) in sorted(stats.items()):
+            row = [name, email, commits, _iso(first), _iso(last)]
+            if repos is not None:
+                row.append(";".join(sorted(repos[(name, email)])))
+            writer.writerow(row)
+
+
+def read_identity_stats(path):
+    stats = {}
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            stats[(row["name"], row["email"])] = [
+                int(row["commits"]), _unix(row["first_seen"]), _unix(row["last_seen"])
+            ]
+    return stats
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _unix(iso):
+    return int(datetime.fromisoformat(iso).timestamp())
+
+
+def write_devs(devs, path):
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile, delimiter=',', quotechar='"')
+        writer.writerow(["name", "email"])
+        writer.writerows(devs)
+
+
+# This block of code reads an existing csv of developers
+def read_devs(path):
+    devs = []
+    # Read csv file with name,dev columns
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',')
+        for row in reader:
+            devs.append(row)
+    # First element is header, skip
+    return devs[1:]
 
 
 # Function for pre-processing each name,email
@@ -81,14 +282,29 @@ def process(dev):
     return name, first, last, i_first, i_last, email, prefix
 
 
-# Compute similarity between all possible pairs
-SIMILARITY = []
-for dev_a, dev_b in combinations(DEVS, 2):
-    # Pre-process both developers
-    name_a, first_a, last_a, i_first_a, i_last_a, email_a, prefix_a = process(dev_a)
-    name_b, first_b, last_b, i_first_b, i_last_b, email_b, prefix_b = process(dev_b)
+# Pairs of developer indices (i < j) to compare.
+# "exhaustive" compares every pair (quadratic, kept for recall audits),
+# "blocked" only pairs sharing a blocking key from ML/src/blocking.py
+def candidate_pairs(devs, mode="blocked", max_bucket=1000):
+    if mode == "exhaustive":
+        yield from combinations(range(len(devs)), 2)
+        return
+    if mode != "blocked":
+        raise ValueError(f"Unknown candidate mode: {mode}")
+
+    from src.blocking import merge_candidate_index
+
+    records = [{"name": name, "email": email} for name, email in devs]
+    # every row is its own identity, so pairs sharing an email are kept
+    left, right = merge_candidate_index(records, max_bucket=max_bucket, dedup="position")
+    yield from zip(np.minimum(left, right).tolist(), np.maximum(left, right).tolist())
+
+
+# Conditions of Bird heuristic on two pre-processed developers
+def bird_scores(proc_a, proc_b):
+    name_a, first_a, last_a, i_first_a, i_last_a, email_a, prefix_a = proc_a
+    name_b, first_b, last_b, i_first_b, i_last_b, email_b, prefix_b = proc_b
 
-    # Conditions of Bird heuristic
     c1 = sim(name_a, name_b)
     c2 = sim(prefix_b, prefix_a)
     c31 = sim(first_a, first_b)
@@ -104,31 +320,146 @@ for dev_a, dev_b in combinations(DEVS, 2):
     if i_last_b != "":
         c7 = i_last_b in prefix_a and first_b in prefix_a
 
-    # Save similarity data for each conditions. Original names are saved
-    SIMILARITY.append([dev_a[0], email_a, dev_b[0], email_b, c1, c2, c31, c32, c4, c5, c6, c7])
+    return c1, c2, c31, c32, c4, c5, c6, c7
+
 
+# Length bound of the Levenshtein ratio: the indel distance is at least
+# |la - lb|, so ratio <= 2 * min(la, lb) / (la + lb), and 1 for two empty strings
+def ratio_bound(la, lb):
+    total = la + lb
+    return np.where(total == 0, 1.0, 2 * np.minimum(la, lb) / np.maximum(total, 1))
 
 
-# Save data on all pairs (might be too big -> comment out to avoid)
-cols = ["name_1", "email_1", "name_2", "email_2", "c1", "c2",
-        "c3.1", "c3.2", "c4", "c5", "c6", "c7"]
-df = pd.DataFrame(SIMILARITY, columns=cols)
-df.to_csv(os.path.join("project1devs", "devs_similarity.csv"), index=False, header=True)
+# Mask of the pairs (left[k], right[k]) for which c1, c2 or c3 reaches t.
+# Length bounds rule out pairs before any ratio is computed, and the ratios
+# that are computed use score_cutoff so they can stop once t is out of reach
+def threshold_mask(fields, lengths, left, right, t):
+    # tolerance so float rounding of the bound never prunes a pair exactly at t
+    t_bound = t - 1e-9
+
+    def bound(field):
+        return ratio_bound(lengths[field][left], lengths[field][right]) >= t_bound
+
+    def reaches(field, candidates):
+        out = np.zeros(len(left), dtype=bool)
+        idx = np.flatnonzero(candidates)
+        if len(idx):
+            scores = rf_process.cpdist(list(fields[field][left[idx]]), list(fields[field][right[idx]]),
+                                       scorer=Indel.normalized_similarity, score_cutoff=t)
+            out[idx] = scores >= t
+        return out
+
+    keep = reaches("name", bound("name"))
+    keep |= reaches("prefix", bound("prefix") & ~keep)
+    c3 = reaches("first", bound("first") & bound("last") & ~keep)
+    keep |= reaches("last", c3)
+    return keep
+
+
+# Compute similarity rows for the given pairs. Original names are saved.
+# With a threshold only rows passing it are produced, and pairs are pruned
+# in chunks before the full set of Bird conditions is evaluated
+def similarity_rows(devs, pairs, threshold=None, chunk_size=100000):
+    # Pre-process each developer once instead of once per pair
+    processed = [process(dev) for dev in devs]
+
+    def row(i, j):
+        scores = bird_scores(processed[i], processed[j])
+        return [devs[i][0], processed[i][5], devs[j][0], processed[j][5], *scores]
+
+    if threshold is None:
+        for i, j in pairs:
+            yield row(i, j)
+        return
+
+    fields = {}
+    lengths = {}
+    for field, k in (("name", 0), ("first", 1), ("last", 2), ("prefix", 6)):
+        fields[field] = np.array([p[k] for p in processed], dtype=object)
+        lengths[field] = np.array([len(p[k]) for p in processed], dtype=np.int64)
+
+    pairs = iter(pairs)
+    while True:
+        chunk = np.array(list(islice(pairs, chunk_size)), dtype=np.int64).reshape(-1, 2)
+        if len(chunk) == 0:
+            return
+        left, right = chunk[:, 0], chunk[:, 1]
+        keep = threshold_mask(fields, lengths, left, right, threshold)
+        for i, j in zip(left[keep], right[keep]):
+            yield row(int(i), int(j))
+
+
+# Check c1-c3 against the threshold
+def passes_threshold(row, t):
+    c1, c2, c31, c32 = row[4:8]
+    return c1 >= t or c2 >= t or (c31 >= t and c32 >= t)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mine developers and apply the Bird heuristic")
+    parser.add_argument("--repo", default=REPO_PATH, help="Repository path or URL to mine")
+    parser.add_argument("--repos", nargs="+",
+                        help="Mine several local repositories concurrently and merge their identities")
+    parser.add_argument("--n-jobs", type=int, default=None,
+                        help="Processes used with --repos (default: one per repository, up to the CPU count)")
+    parser.add_argument("--skip-mining", action="store_true",
+                        help="Reuse the existing devs.csv instead of mining the repository")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only mine commits added since the last run (local repositories)")
+    parser.add_argument("--backend", choices=sorted(COMMIT_BACKENDS), default="pydriller",
+                        help="Read commits with PyDriller or stream them from git log (local repositories)")
+    parser.add_argument("--mode", choices=["blocked", "exhaustive"], default="blocked",
+                        help="Compare only blocked candidate pairs or every pair")
+    parser.add_argument("--max-bucket", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=0.65)
+    parser.add_argument("--write-all", action="store_true",
+                        help="Also score every candidate pair and write devs_similarity.csv")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="File format of the similarity tables (parquet needs pyarrow)")
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    args = parser.parse_args()
+    if args.repos and args.incremental:
+        parser.error("--incremental works on a single --repo")
+
+    devs_csv = os.path.join(args.out_dir, "devs.csv")
+    stats_csv = os.path.join(args.out_dir, "devs_stats.csv")
+    if args.repos and not args.skip_mining:
+        stats, repos = mine_repositories(args.repos, args.backend, args.n_jobs)
+        write_devs(sorted(stats), devs_csv)
+        write_identity_stats(stats, stats_csv, repos=repos)
+    elif args.incremental and not args.skip_mining:
+        mine_developers_incremental(args.repo, devs_csv, os.path.join(args.out_dir, "devs_state.json"),
+                                    stats_csv=stats_csv, backend=args.backend)
+    elif not args.skip_mining:
+        stats = mine_identities(args.repo, args.backend)
+        write_devs(sorted(stats), devs_csv)
+        write_identity_stats(stats, stats_csv)
+    devs = read_devs(devs_csv)
+
+    t = args.threshold
+    print("Threshold:", t)
+
+    pairs = candidate_pairs(devs, mode=args.mode, max_bucket=args.max_bucket)
+    if args.write_all:
+        # Rows are streamed to disk; only the thresholded ones are kept in memory
+        matched = []
+        with TableWriter(os.path.join(args.out_dir, f"devs_similarity.{args.format}"),
+                         SIMILARITY_COLUMNS) as writer:
+            for row in similarity_rows(devs, pairs):
+                writer.write_rows([row])
+                if passes_threshold(row, t):
+                    matched.append(row)
+    else:
+        matched = list(similarity_rows(devs, pairs, threshold=t))
 
+    with TableWriter(os.path.join(args.out_dir, f"devs_similarity_t={t}.{args.format}"),
+                     SIMILARITY_COLUMNS) as writer:
+        writer.write_rows(matched)
 
-# Set similarity threshold, check c1-c3 against the threshold
-t=0.65
-print("Threshold:", t)
-df["c1_check"] = df["c1"] >= t
-df["c2_check"] = df["c2"] >= t
-df["c3_check"] = (df["c3.1"] >= t) & (df["c3.2"] >= t)
-# Keep only rows where at least one condition is True
-# df = df[df[["c1_check", "c2_check", "c3_check", "c4", "c5", "c6", "c7"]].any(axis=1)]
-df = df[df[["c1_check", "c2_check", "c3_check"]].any(axis=1)]
+    print(f"✅ Threshold={t}, matched pairs: {len(matched)}")
+    stats = cache_stats()["levenshtein_ratio"]
+    print(f"Similarity cache: hits={stats['hits']} misses={stats['misses']} size={stats['size']}")
 
-# Omit "check" columns, save to csv
-df = df[["name_1", "email_1", "name_2", "email_2", "c1", "c2",
-        "c3.1", "c3.2", "c4", "c5", "c6", "c7"]]
-df.to_csv(os.path.join("project1devs", f"devs_similarity_t={t}.csv"), index=False, header=True)
 
-print(f"✅ Threshold={t}, matched pairs: {len(df)}")
+if __name__ == "__main__":
+    main()